@@ -0,0 +1,147 @@
+# benchmark.py (fixed-seed benchmark matrix with per-stage timings, for comparing versions)
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import itertools
+
+from telemetry import log
+
+STYLES = ["random", "geometric", "easy_mandala"]
+COLOR_MODES = ["basic", "advanced"]
+HINT_MODES = ["none", "name", "number"]
+RADII = [1.2, 1.35, 1.48]
+BENCHMARK_SEEDS = [1, 2]
+BENCHMARK_DIR = os.path.join("tmp", "benchmark")
+BENCHMARK_OUTPUT = "benchmark.json"
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux and in bytes on macOS; not available on Windows
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def file_size(path):
+    return os.path.getsize(path) if os.path.exists(path) else None
+
+class StageTimer:
+    def __init__(self):
+        self.stages = {}
+
+    def run(self, stage, fn, *args, **kwargs):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        self.stages[stage] = round((time.perf_counter() - start) * 1000, 2)
+        return result
+
+def benchmark_case(workdir, style, color_mode, hint_mode, radius, seed, image_format, compile_latex):
+    """
+    One page through every stage; timings in ms, sizes in bytes.
+    """
+    from mandala_generator import generate_mandala_scene
+    from mpl_renderer import get_renderer, draw_scene
+    from pdf_tools import create_pdf_file
+    from latex_tools import create_latex_file, compile_latex_pdf
+
+    timer = StageTimer()
+    scene, legend = timer.run("geometry", generate_mandala_scene, hint_mode, color_mode, style, radius, seed=seed)
+
+    image_path = os.path.join(workdir, "mandala." + image_format)
+    renderer = get_renderer()
+    timer.run("drawing", lambda: draw_scene(renderer.new_page(), scene))
+    timer.run("savefig", renderer.save, [image_path])
+
+    native_pdf = os.path.join(workdir, "native.pdf")
+    timer.run("native_pdf", create_pdf_file, image_path, native_pdf, legend=legend, seed=seed)
+
+    tex_path = os.path.join(workdir, "mandala.tex")
+    latex_pdf = os.path.join(workdir, "latex.pdf")
+    timer.run("latex_write", create_latex_file, image_path, tex_path, legend=legend, seed=seed)
+    compiled = None
+    if compile_latex:
+        compiled = timer.run("latex_compile", compile_latex_pdf, tex_path, workdir, latex_pdf)
+
+    return {
+        "mandala_style": style,
+        "color_mode": color_mode,
+        "color_hint_mode": hint_mode,
+        "mandala_max_radius": radius,
+        "seed": seed,
+        "ms": timer.stages,
+        "outlines": len(scene.circle_centers) + len(scene.polygons) + len(scene.lines),
+        "labels": len(scene.labels),
+        "bytes": {
+            "image": file_size(image_path),
+            "native_pdf": file_size(native_pdf),
+            "latex_pdf": file_size(latex_pdf) if compiled else None,
+        },
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def summarize(cases):
+    """
+    Total and mean time per stage, overall and per style.
+    """
+    def totals(subset):
+        stages = {}
+        for case in subset:
+            for stage, ms in case["ms"].items():
+                stages.setdefault(stage, []).append(ms)
+        return {stage: {"total_ms": round(sum(v), 1), "mean_ms": round(sum(v) / len(v), 2)}
+                for stage, v in stages.items()}
+
+    summary = {"all": totals(cases)}
+    for style in STYLES:
+        subset = [case for case in cases if case["mandala_style"] == style]
+        if subset:
+            summary[style] = totals(subset)
+    return summary
+
+def run_benchmark(output_path=BENCHMARK_OUTPUT, image_format="png", seeds=BENCHMARK_SEEDS, compile_latex=None):
+    """
+    Run the whole matrix (styles x color lists x hint modes x radii x seeds) and write the report as JSON.
+    compile_latex: None = only if pdflatex is installed.
+    """
+    import numpy
+    import matplotlib
+    from render_cache import source_version, RENDERER_MODULES
+
+    if compile_latex is None:
+        compile_latex = shutil.which("pdflatex") is not None
+    matrix = list(itertools.product(STYLES, COLOR_MODES, HINT_MODES, RADII, seeds))
+    log("INFO", f"Benchmarking {len(matrix)} page(s) ({image_format}, "
+            f"LaTeX compile {'on' if compile_latex else 'off'})...")
+
+    os.makedirs(BENCHMARK_DIR, exist_ok=True)
+    started = time.perf_counter()
+    cases = []
+    try:
+        for i, params in enumerate(matrix):
+            cases.append(benchmark_case(BENCHMARK_DIR, *params, image_format=image_format, compile_latex=compile_latex))
+            if (i + 1) % 18 == 0:
+                log("INFO", f"{i + 1}/{len(matrix)} page(s) done...")
+    finally:
+        shutil.rmtree(BENCHMARK_DIR, ignore_errors=True)
+
+    report = {
+        "renderer_version": source_version(RENDERER_MODULES),
+        "python": platform.python_version(),
+        "numpy": numpy.__version__,
+        "matplotlib": matplotlib.__version__,
+        "platform": platform.platform(),
+        "image_format": image_format,
+        "latex_compile": compile_latex,
+        "wall_s": round(time.perf_counter() - started, 2),
+        "peak_rss_mb": peak_rss_mb(),
+        "summary": summarize(cases),
+        "cases": cases,
+    }
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    log("SUCCESS", f"Benchmark written to {output_path} ({report['wall_s']} s)")
+    return report
@@ -0,0 +1,111 @@
+# color_assigner.py (the colors of one page: palette, hint numbers, optional different colors for neighbors)
+import heapq
+import numpy as np
+
+class ColorAssigner:
+    """
+    Hands out the colors of one page and their hint texts.
+    numbers (color -> hint number) is filled in order of first use, so number n is simply len(numbers) + 1 and
+    the legend is that dict sorted by number. max_colors caps the distinct colors of the page: once that many
+    have been used, only those are picked again.
+    """
+    def __init__(self, palette, hint_mode="number", rng=None, numbers=None, max_colors=None):
+        self.palette = list(palette or [])
+        self.hint_mode = hint_mode
+        self.rng = np.random.default_rng() if rng is None else rng
+        self.numbers = {} if numbers is None else numbers
+        self.max_colors = max_colors
+        self.used = []
+        self.used_set = set()
+
+    def options(self):
+        if self.max_colors and len(self.used) >= self.max_colors:
+            return self.used
+        return self.palette
+
+    def use(self, color):
+        if color not in self.used_set:
+            self.used_set.add(color)
+            self.used.append(color)
+        return color
+
+    def pick(self, fits=None):
+        # One rng.integers() draw per pick (as the draw functions always did), so seeds keep their pages.
+        # fits: optional color -> bool filter; None (and no draw) when no allowed color passes it
+        options = self.options()
+        if fits is not None:
+            options = [color for color in options if fits(color)]
+            if not options:
+                return None
+        return self.use(options[int(self.rng.integers(len(options)))])
+
+    def number(self, color):
+        number = self.numbers.get(color)
+        if number is None:
+            number = self.numbers[color] = len(self.numbers) + 1
+        return number
+
+    def hint(self, color):
+        return color if self.hint_mode == "name" else str(self.number(color))
+
+    def legend(self):
+        # (number, color) pairs for the number mode legend, None otherwise
+        if self.hint_mode != "number" or not self.numbers:
+            return None
+        return sorted((number, color) for color, number in self.numbers.items())
+
+    def color_graph(self, count, edges, method="dsatur", fits=None):
+        """
+        Colors for count regions so that regions joined by an edge (pairs of indexes) get different colors.
+        "dsatur" colors the region with the most differently colored neighbors next (ties: most neighbors),
+        "greedy" goes by number of neighbors only. Each region gets a random color among those its neighbors
+        do not have yet; if the palette (or max_colors) leaves none, the one least used around it.
+        fits: optional (region, color) -> bool filter; a region no allowed color passes gets None.
+        """
+        neighbors = [[] for _ in range(count)]
+        for a, b in edges:
+            neighbors[a].append(b)
+            neighbors[b].append(a)
+        palette = self.palette
+        if self.max_colors:
+            # Colors already used on the page count towards the cap
+            rest = [color for color in palette if color not in self.used_set]
+            extra = max(self.max_colors - len(self.used), 0)
+            palette = self.used[:self.max_colors] + [rest[i] for i in self.rng.permutation(len(rest))[:extra]]
+        colors = [None] * count
+
+        def choose(region):
+            options = palette if fits is None else [color for color in palette if fits(region, color)]
+            if not options:
+                return None
+            around = {}
+            for other in neighbors[region]:
+                if colors[other] is not None:
+                    around[colors[other]] = around.get(colors[other], 0) + 1
+            free = [color for color in options if color not in around]
+            if free:
+                return free[int(self.rng.integers(len(free)))]
+            return min(options, key=lambda color: around[color])
+
+        if method == "greedy":
+            for region in sorted(range(count), key=lambda region: -len(neighbors[region])):
+                colors[region] = choose(region)
+        elif method == "dsatur":
+            saturation = [set() for _ in range(count)]
+            heap = [(0, -len(neighbors[region]), region) for region in range(count)]
+            heapq.heapify(heap)
+            while heap:
+                negative_saturation, _, region = heapq.heappop(heap)
+                # Stale entry: the region was colored, or its saturation grew since it was pushed
+                if colors[region] is not None or -negative_saturation != len(saturation[region]):
+                    continue
+                color = colors[region] = choose(region)
+                if color is None:
+                    continue
+                for other in neighbors[region]:
+                    if colors[other] is None and color not in saturation[other]:
+                        saturation[other].add(color)
+                        heapq.heappush(heap, (-len(saturation[other]), -len(neighbors[other]), other))
+        else:
+            raise ValueError(f"Unknown coloring method: {method}")
+        return [None if color is None else self.use(color) for color in colors]
@@ -0,0 +1,88 @@
+# geometry.py (vectorized ring geometry for the mandala draw functions)
+import numpy as np
+
+# Vertices used to approximate one ellipse outline
+ELLIPSE_VERTICES = 72
+
+def ring_angles(n, rotation=0.0):
+    return np.linspace(0, 2*np.pi, n, endpoint=False) + rotation
+
+def ring_points(center, radius, angles):
+    """
+    Points at the given angles on a circle: array (n, 2). radius may be a scalar or one value per angle.
+    """
+    angles = np.asarray(angles, dtype=float)
+    radius = np.asarray(radius, dtype=float)
+    return np.stack([center[0] + np.cos(angles)*radius, center[1] + np.sin(angles)*radius], axis=-1)
+
+def regular_polygons(centers, radius, n_sides, rotations=0.0):
+    """
+    One regular polygon per center: array (n_shapes, n_sides, 2).
+    radius and rotations may be scalars or one value per shape.
+    """
+    centers = np.asarray(centers, dtype=float).reshape(-1, 2)
+    radius = np.broadcast_to(np.asarray(radius, dtype=float), (len(centers),))
+    rotations = np.broadcast_to(np.asarray(rotations, dtype=float), (len(centers),))
+    angles = rotations[:, None] + ring_angles(n_sides)[None, :]
+    return centers[:, None, :] + np.stack([np.cos(angles), np.sin(angles)], axis=-1) * radius[:, None, None]
+
+def star_polygons(centers, outer_r, inner_r, n_points, rotations=0.0):
+    """
+    One star per center, alternating outer/inner vertices: array (n_shapes, 2*n_points, 2).
+    """
+    centers = np.asarray(centers, dtype=float).reshape(-1, 2)
+    rotations = np.broadcast_to(np.asarray(rotations, dtype=float), (len(centers),))
+    steps = np.arange(2*n_points)
+    radii = np.where(steps % 2 == 0, outer_r, inner_r)
+    angles = rotations[:, None] + steps[None, :] * np.pi / n_points
+    return centers[:, None, :] + np.stack([np.cos(angles), np.sin(angles)], axis=-1) * radii[None, :, None]
+
+def ellipses(centers, widths, heights, angles_deg, n_vertices=ELLIPSE_VERTICES):
+    """
+    Sampled outlines of rotated ellipses (same parameters as matplotlib's Ellipse): array (n_shapes, n_vertices, 2).
+    """
+    centers = np.asarray(centers, dtype=float).reshape(-1, 2)
+    n = len(centers)
+    widths = np.broadcast_to(np.asarray(widths, dtype=float), (n,))
+    heights = np.broadcast_to(np.asarray(heights, dtype=float), (n,))
+    rot = np.radians(np.broadcast_to(np.asarray(angles_deg, dtype=float), (n,)))
+    t = np.linspace(0, 2*np.pi, n_vertices, endpoint=False)
+    lx = (widths[:, None] / 2) * np.cos(t)[None, :]
+    ly = (heights[:, None] / 2) * np.sin(t)[None, :]
+    cos_r, sin_r = np.cos(rot)[:, None], np.sin(rot)[:, None]
+    return np.stack([centers[:, 0:1] + lx*cos_r - ly*sin_r,
+                     centers[:, 1:2] + lx*sin_r + ly*cos_r], axis=-1)
+
+def ring_triangles(center, angles, tip_r, base_r, half_spread):
+    """
+    Radial triangles: the tip at (angle, tip_r), the base corners at (angle +- half_spread, base_r).
+    Returns array (n_shapes, 3, 2).
+    """
+    angles = np.asarray(angles, dtype=float)
+    corner_angles = np.stack([angles, angles + half_spread, angles - half_spread], axis=-1)
+    corner_radii = np.array([tip_r, base_r, base_r], dtype=float)
+    return ring_points(center, corner_radii, corner_angles)
+
+def arc_polygons(center, radius, angles, step, n_vertices):
+    """
+    Polygons whose vertices lie on one circle, starting at each angle and advancing by step: array (n_shapes, n_vertices, 2).
+    """
+    angles = np.asarray(angles, dtype=float)[:, None] + step * np.arange(n_vertices)[None, :]
+    return ring_points(center, radius, angles)
+
+def radial_segments(center, angles, r_start, r_end):
+    """
+    Straight spokes between two radii: array (n_shapes, 2, 2).
+    """
+    angles = np.asarray(angles, dtype=float)
+    return np.stack([ring_points(center, r_start, angles), ring_points(center, r_end, angles)], axis=1)
+
+def spirals(origins, a, b, theta, rotations=0.0):
+    """
+    Archimedean spirals r = a + b*theta/(2*pi) around each origin: array (n_shapes, len(theta), 2).
+    """
+    origins = np.asarray(origins, dtype=float).reshape(-1, 2)
+    rotations = np.broadcast_to(np.asarray(rotations, dtype=float), (len(origins),))
+    radius = a + b * theta / (2*np.pi)
+    angles = theta[None, :] + rotations[:, None]
+    return origins[:, None, :] + np.stack([np.cos(angles), np.sin(angles)], axis=-1) * radius[None, :, None]
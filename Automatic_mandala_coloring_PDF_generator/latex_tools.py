@@ -1,22 +1,39 @@
-# latex_tools.py (unchanged; included for completeness)
+# latex_tools.py (LaTeX page template and pdflatex runs: timeouts, error diagnostics, precompiled preamble)
 import os
 import subprocess
 import shutil
+import re
 import math
+import hashlib
 
-def create_latex_file(image_path, tex_output_path, legend=None):
-    """
-    Format the mandala image on A4 page with minimal margins.
-    If legend is given, place it in bottom left, horizontal table, max 5 columns, then go to next row.
-    """
-    latex_code = r"""
+from telemetry import log, timed
+
+# Seconds before a pdflatex run is killed, and how many times a run that timed out is started again
+LATEX_TIMEOUT = 120
+LATEX_RETRIES = 1
+# "file:line: message" errors (-file-line-error)
+LATEX_FILE_LINE_ERROR = re.compile(r"^[^:\s][^:]*:\d+: ")
+# Log messages of a precompiled preamble that does not load or work (mismatched .fmt, mylatexformat dump marker)
+LATEX_FORMAT_ERRORS = ["endofdump", "Fatal format file error", "format file"]
+
+LATEX_PREAMBLE = r"""
 \documentclass[a4paper]{article}
 \usepackage[margin=1.5cm]{geometry}
 \usepackage{graphicx}
 \usepackage{array}
 \usepackage{float}
 \pagestyle{empty}
+\csname endofdump\endcsname
 \begin{document}
+"""
+# Everything before \endofdump goes into the precompiled format (mylatexformat); when the format is loaded, that
+# part of the file is skipped, and without the format \csname endofdump\endcsname is just \relax
+
+def latex_page_body(image_path, legend=None):
+    """
+    Build the LaTeX body of one page: the centered mandala image plus its optional legend table.
+    """
+    latex_code = r"""
 \begin{center}
   \includegraphics[width=18cm,height=25cm,keepaspectratio]{%s}
 \end{center}
@@ -65,25 +82,234 @@ def create_latex_file(image_path, tex_output_path, legend=None):
 \end{minipage}
 \end{flushleft}
 """
+    return latex_code
+
+def latex_seed_info(seeds):
+    # Record the page seed(s) in the PDF metadata, so a page can be regenerated instead of stored
+    seeds = [str(seed) for seed in seeds if seed is not None]
+    if not seeds:
+        return ""
+    return r"\pdfinfo{/Subject (Mandala seed%s %s)}" % ("s" if len(seeds) > 1 else "", " ".join(seeds)) + "\n"
+
+def create_latex_file(image_path, tex_output_path, legend=None, seed=None):
+    """
+    Format the mandala image on A4 page with minimal margins.
+    If legend is given, place it in bottom left, horizontal table, max 5 columns, then go to next row.
+    """
+    latex_code = LATEX_PREAMBLE + latex_seed_info([seed]) + latex_page_body(image_path, legend)
+    latex_code += r"\end{document}\n"
+    with open(tex_output_path, "w", encoding="utf-8") as f:
+        f.write(latex_code)
+
+def create_latex_book(pages, tex_output_path, seeds=None):
+    """
+    Write a single document with one A4 page per mandala.
+    pages is a list of (image_path, legend) tuples, laid out like create_latex_file.
+    """
+    bodies = [latex_page_body(image_path, legend) for image_path, legend in pages]
+    latex_code = LATEX_PREAMBLE + latex_seed_info(seeds or []) + "\n\\clearpage\n".join(bodies)
     latex_code += r"\end{document}\n"
     with open(tex_output_path, "w", encoding="utf-8") as f:
         f.write(latex_code)
 
-def compile_latex_pdf(tex_file, workdir, pdf_output_path):
+def latex_log_errors(log_path, limit=3):
+    """
+    The TeX errors in a .log file: each "! ..." or "file:line: ..." message with the "l.<n>" context line.
+    """
+    if not os.path.exists(log_path):
+        return []
+    with open(log_path, "r", encoding="latin-1") as f:
+        lines = [line.rstrip() for line in f]
+    errors = []
+    for i, line in enumerate(lines):
+        if not (line.startswith("! ") or LATEX_FILE_LINE_ERROR.match(line)):
+            continue
+        context = next((lines[j] for j in range(i + 1, min(i + 12, len(lines))) if lines[j].startswith("l.")), None)
+        errors.append(line + (f" ({context})" if context else ""))
+        if len(errors) == limit:
+            break
+    return errors
+
+def latex_format_failed(log_path):
+    """
+    True if a compile with the precompiled preamble failed because of the format itself: one that cannot be
+    loaded stops TeX before it opens the .log, one that loads but is broken leaves its error there.
+    """
+    if not os.path.exists(log_path):
+        return True
+    with open(log_path, "r", encoding="latin-1") as f:
+        text = f.read()
+    return any(marker in text for marker in LATEX_FORMAT_ERRORS)
+
+def keep_latex_diagnostics(tex_file, workdir, diagnostics_dir, name):
+    """
+    Copy the .tex and .log of a failed compile to <diagnostics_dir>/<name>.tex/.log (the scratch directory
+    is deleted afterwards). Returns the .log copy, or the .tex copy if pdflatex wrote no log.
+    """
+    os.makedirs(diagnostics_dir, exist_ok=True)
+    job = os.path.join(workdir, os.path.splitext(os.path.basename(tex_file))[0])
+    kept = None
+    for extension in (".tex", ".log"):
+        if os.path.exists(job + extension):
+            kept = os.path.join(diagnostics_dir, name + extension)
+            shutil.copyfile(job + extension, kept)
+    return kept
+
+def latex_env(format_dir):
+    # Let pdflatex find our format next to the installed ones (the empty entry stands for the default path)
+    return dict(os.environ, TEXFORMATS=os.path.abspath(format_dir) + os.pathsep + os.environ.get("TEXFORMATS", ""))
+
+# Formats whose build timed out or could not start in this process (no marker file: the next run tries again)
+_unbuilt_formats = set()
+
+def latex_format(format_dir, timeout=LATEX_TIMEOUT):
+    """
+    Name of the preamble precompiled with mylatexformat into <format_dir>/<name>.fmt, built on first use.
+    The name changes with the preamble and the pdflatex binary, so an update builds a new one.
+    Returns None if it cannot be built. A build that fails (e.g. mylatexformat not installed) is remembered and
+    not retried; one that timed out or could not start is tried again next time.
+    """
+    pdflatex = shutil.which("pdflatex")
+    if pdflatex is None:
+        return None
+    stamp = f"{LATEX_PREAMBLE}|{os.path.realpath(pdflatex)}|{os.path.getmtime(pdflatex)}"
+    name = "mandala-" + hashlib.sha1(stamp.encode("utf-8")).hexdigest()[:12]
+    fmt = os.path.join(format_dir, name + ".fmt")
+    failed = os.path.join(format_dir, name + ".failed")
+    if os.path.exists(fmt):
+        return name
+    if os.path.exists(failed) or name in _unbuilt_formats:
+        return None
+
+    os.makedirs(format_dir, exist_ok=True)
+    # Workers may build at the same time: each under its own job name, then renamed into place
+    job = os.path.join(format_dir, f"{name}-{os.getpid()}")
+    with open(job + ".tex", "w", encoding="utf-8") as f:
+        f.write(LATEX_PREAMBLE + "\\end{document}\n")
+    cmd = [
+        "pdflatex",
+        "-ini",
+        "-interaction=nonstopmode",
+        "-halt-on-error",
+        "-jobname=" + os.path.basename(job),
+        "-output-directory", format_dir,
+        "&pdflatex", "mylatexformat.ltx", job + ".tex"
+    ]
+    try:
+        with timed("latex_format", name=name) as event:
+            result = subprocess.run(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                    stderr=subprocess.DEVNULL, timeout=timeout, env=latex_env(format_dir))
+            event["returncode"] = result.returncode
+        built = result.returncode == 0 and os.path.exists(job + ".fmt")
+        # Only a build that ran and failed will fail the same way again
+        broken = not built
+    except (OSError, subprocess.TimeoutExpired) as e:
+        built, broken = False, False
+        # Not again in this process: every page would wait for the timeout once more
+        _unbuilt_formats.add(name)
+        log("WARNING", f"Could not precompile the LaTeX preamble ({type(e).__name__}); trying again next run.")
+    if built:
+        os.replace(job + ".fmt", fmt)
+    elif broken:
+        open(failed, "w").close()
+        log("WARNING", "Could not precompile the LaTeX preamble (is the 'mylatexformat' package installed?); "
+                       "every page loads the full preamble.")
+    for extension in (".tex", ".log", ".fmt"):
+        if os.path.exists(job + extension):
+            os.remove(job + extension)
+    return name if built else None
+
+def run_pdflatex(tex_file, workdir, timeout, retries, fmt=None, format_dir=None):
+    """
+    Run pdflatex until it finishes within timeout (at most retries + 1 times).
+    Returns its exit status, or None if every run timed out.
+    """
+    cmd = ["pdflatex"]
+    if fmt:
+        cmd.append("-fmt=" + fmt)
+    cmd += [
+        "-interaction=nonstopmode",
+        "-halt-on-error",
+        "-file-line-error",
+        "-output-directory", workdir,
+        tex_file
+    ]
+    env = latex_env(format_dir) if fmt else None
+    for attempt in range(retries + 1):
+        with timed("pdflatex", tex_file=tex_file, attempt=attempt, format=fmt, timeout=False) as event:
+            try:
+                # No stdin: TeX can never sit waiting for input
+                result = subprocess.run(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                        stderr=subprocess.DEVNULL, timeout=timeout, env=env)
+                event["returncode"] = result.returncode
+                return result.returncode
+            except subprocess.TimeoutExpired:
+                event["timeout"] = True
+        log("WARNING", f"pdflatex timed out after {timeout} s on {os.path.basename(tex_file)}"
+                       + (", retrying..." if attempt < retries else "."))
+    return None
+
+def compile_latex_pdf(tex_file, workdir, pdf_output_path, timeout=LATEX_TIMEOUT, retries=LATEX_RETRIES,
+                      diagnostics_dir=None, format_dir=None):
     """
     Compile the LaTeX file to PDF using pdflatex, save PDF to 'output'.
+    pdflatex stops at the first error and is killed after timeout seconds; only timeouts are retried
+    (an error in the document fails the same way every time). On failure the errors from the .log are printed
+    and, with diagnostics_dir set, the .tex and .log are kept there under the name of the output file.
+    With format_dir set, the preamble is loaded from a precompiled format kept there (see latex_format).
     """
+    job = os.path.join(workdir, os.path.splitext(os.path.basename(tex_file))[0])
+    fmt = latex_format(format_dir, timeout) if format_dir else None
     try:
-        cmd = [
-            "pdflatex",
-            "-interaction=nonstopmode",
-            "-output-directory", workdir,
-            tex_file
-        ]
-        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        pdf_temp = os.path.join(workdir, os.path.splitext(os.path.basename(tex_file))[0] + ".pdf")
-        shutil.move(pdf_temp, pdf_output_path)
+        if fmt and os.path.exists(job + ".log"):
+            # A log left over from an earlier run would hide a format that did not load
+            os.remove(job + ".log")
+        returncode = run_pdflatex(tex_file, workdir, timeout, retries, fmt, format_dir)
+        if fmt and returncode not in (0, None) and latex_format_failed(job + ".log"):
+            # A format that does not load (TeX updated in place, broken dump) must not fail the page:
+            # compile the full preamble, and if that works, drop the format so it is built again next time.
+            # Errors in the document itself fail the same way without the format, so they are not run twice
+            log("WARNING", "Compiling again without the precompiled LaTeX preamble...")
+            returncode = run_pdflatex(tex_file, workdir, timeout, retries)
+            if returncode == 0 and os.path.exists(os.path.join(format_dir, fmt + ".fmt")):
+                os.remove(os.path.join(format_dir, fmt + ".fmt"))
+    except OSError as e:
+        log("ERROR", f"pdflatex: {e}")
+        return False
+
+    if returncode == 0 and os.path.exists(job + ".pdf"):
+        shutil.move(job + ".pdf", pdf_output_path)
         return True
-    except Exception as e:
-        print(f"[ERROR] pdflatex: {e}")
-        return False
\ No newline at end of file
+
+    if returncode is None:
+        errors = [f"timed out after {timeout} s"]
+    else:
+        errors = latex_log_errors(job + ".log") or [f"exit status {returncode}"]
+    for error in errors:
+        log("ERROR", f"pdflatex: {error}")
+    if diagnostics_dir:
+        name = os.path.splitext(os.path.basename(pdf_output_path))[0]
+        kept = keep_latex_diagnostics(tex_file, workdir, diagnostics_dir, name)
+        if kept:
+            log("INFO", f"LaTeX diagnostics kept in {kept}")
+    return False
+
+def split_pdf_pages(pdf_path, pdf_output_paths):
+    """
+    Split a multi-page PDF into one file per page (needs the 'pypdf' package from requirements.txt).
+    """
+    try:
+        from pypdf import PdfReader, PdfWriter
+    except ImportError:
+        log("WARNING", "Splitting pages needs the 'pypdf' package (pip install pypdf); skipped.")
+        return False
+    reader = PdfReader(pdf_path)
+    if len(reader.pages) != len(pdf_output_paths):
+        log("WARNING", f"{pdf_path} has {len(reader.pages)} pages, expected {len(pdf_output_paths)}; split skipped.")
+        return False
+    for page, output_path in zip(reader.pages, pdf_output_paths):
+        writer = PdfWriter()
+        writer.add_page(page)
+        with open(output_path, "wb") as f:
+            writer.write(f)
+    return True
@@ -5,12 +5,20 @@ import subprocess
 import platform
 import shutil
 import json
+import importlib.util
+
+from telemetry import log, emit, timed, profiled, configure
 
 OUTPUT_DIR = "output"
 TMP_DIR = "tmp"
-MANDALA_IMAGE = os.path.join(TMP_DIR, "mandala.png")
-LATEX_FILE = os.path.join(TMP_DIR, "mandala.tex")
+# .tex and .log of pages pdflatex failed on
+FAILED_DIR = os.path.join(OUTPUT_DIR, "failed")
+# Precompiled LaTeX preamble, kept between runs
+LATEX_FORMAT_DIR = ".latex-format"
 CONFIG_FILE = "config.json"
+# Results of the dependency checks, reused by later runs with the same interpreter and PATH
+PROBE_FILE = ".probes.json"
+REQUIRED_PACKAGES = ["matplotlib", "numpy"]
 
 def get_os_type():
     os_name = platform.system()
@@ -62,21 +70,60 @@ def print_install_instructions(component):
         else:
             print("Please refer to your system documentation for required Python packages.")
 
-def check_python_packages():
+def load_probes():
+    key = {"python": sys.executable, "version": sys.version, "path": os.environ.get("PATH", "")}
     try:
-        import matplotlib
-        import numpy
-    except ImportError:
-        print("\n[ERROR] Required Python packages (matplotlib, numpy) are missing.")
-        print_install_instructions("Python Packages")
-        sys.exit(1)
+        with open(PROBE_FILE, "r", encoding="utf-8") as f:
+            probes = json.load(f)
+    except (OSError, ValueError):
+        probes = {}
+    # A different interpreter or PATH may see different packages and another pdflatex
+    if not isinstance(probes, dict) or probes.get("key") != key:
+        probes = {"key": key}
+    return probes
 
-def check_pdflatex():
+def save_probes(probes):
     try:
-        subprocess.run(["pdflatex", "--version"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
-        return True
-    except Exception:
+        with open(PROBE_FILE, "w", encoding="utf-8") as f:
+            json.dump(probes, f)
+    except OSError:
+        pass
+
+def check_python_packages(probes=None):
+    # find_spec only locates the packages: importing matplotlib here would cost more than a whole page
+    probes = probes if probes is not None else {}
+    origins = probes.get("packages")
+    if origins and all(origin and os.path.exists(origin) for origin in origins.values()):
+        return
+    origins = {}
+    for name in REQUIRED_PACKAGES:
+        spec = importlib.util.find_spec(name)
+        if spec is None:
+            print("\n[ERROR] Required Python packages (matplotlib, numpy) are missing.")
+            print_install_instructions("Python Packages")
+            sys.exit(1)
+        origins[name] = spec.origin
+    probes["packages"] = origins
+
+def check_pdflatex(probes=None):
+    probes = probes if probes is not None else {}
+    path = shutil.which("pdflatex")
+    if path is None:
         return False
+    # Only run "pdflatex --version" again when the binary itself changed
+    stamp = [path, os.path.getmtime(path)]
+    cached = probes.get("pdflatex")
+    if cached and cached.get("stamp") == stamp:
+        return cached["ok"]
+    try:
+        subprocess.run([path, "--version"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        ok = True
+    except Exception:
+        ok = False
+    if ok:
+        # A failure is never cached, so installing LaTeX takes effect on the next run
+        probes["pdflatex"] = {"stamp": stamp, "ok": ok}
+    return ok
 
 def guide_latex_installation():
     print("\n[ERROR] LaTeX is not installed or 'pdflatex' is not available.")
@@ -91,19 +138,155 @@ def ensure_dirs():
     os.makedirs(TMP_DIR, exist_ok=True)
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-def get_next_pdf_filename(output_dir):
-    files = [f for f in os.listdir(output_dir) if f.startswith("output") and f.endswith(".pdf")]
-    nums = []
+def get_used_pdf_numbers(output_dir, prefix="output"):
+    files = [f for f in os.listdir(output_dir) if f.startswith(prefix) and f.endswith(".pdf")]
+    nums = set()
     for f in files:
-        basename = f.replace("output", "").replace(".pdf", "")
+        basename = f.replace(prefix, "").replace(".pdf", "")
         try:
-            nums.append(int(basename))
+            nums.add(int(basename))
         except ValueError:
             pass
-    idx = 1
-    while idx in nums:
-        idx += 1
-    return f"output{idx}.pdf"
+    return nums
+
+def get_worker_count(config):
+    workers = config.get("workers", 1)
+    try:
+        workers = int(workers)
+    except (TypeError, ValueError):
+        workers = 1
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return workers
+
+def get_image_extension(config):
+    # Vector formats are embedded as PDF (pdflatex and the native writer both place PDF pages);
+    # "scene" hands the bare geometry to the native writer, which draws it itself
+    image_format = config.get("image_format", "png")
+    if image_format == "png":
+        return ".png"
+    if image_format == "scene" and uses_native_pdf(config):
+        return ".npz"
+    return ".pdf"
+
+def get_svg_exports(config, base_path):
+    if config.get("image_format", "png") == "svg":
+        return [os.path.splitext(base_path)[0] + ".svg"]
+    return None
+
+def get_page_seeds(config, batch_count):
+    """
+    Per-page seeds derived from config["seed"] (or a fresh batch seed): the same seed always redraws the same pages.
+    """
+    from mandala_generator import new_batch_seed, page_seeds
+
+    base_seed = config.get("seed")
+    if base_seed is None:
+        base_seed = new_batch_seed()
+    log("INFO", f"Batch seed: {base_seed}")
+    return page_seeds(base_seed, batch_count)
+
+def mandala_options(config):
+    return {
+        "color_hint_mode": config.get("color_hint_mode", "none"),
+        "color_mode": config.get("color_mode", "basic"),
+        "mandala_style": config.get("mandala_style", "random"),
+        "mandala_max_radius": config.get("mandala_max_radius", 1.35),
+        "hint_placement": config.get("hint_placement", "shape"),
+        "max_colors": config.get("max_colors"),
+        "adjacent_colors": config.get("adjacent_colors", "random"),
+        "raster_mode": config.get("raster_mode", "rgba"),
+        "raster_dpi": config.get("raster_dpi"),
+        "raster_strip_height": config.get("raster_strip_height"),
+    }
+
+def latex_options(config):
+    from latex_tools import LATEX_TIMEOUT, LATEX_RETRIES
+    return {"timeout": config.get("latex_timeout", LATEX_TIMEOUT),
+            "retries": config.get("latex_retries", LATEX_RETRIES), "diagnostics_dir": FAILED_DIR,
+            "format_dir": LATEX_FORMAT_DIR if config.get("latex_format", True) else None}
+
+def render_image(config, image_path, export_paths=None, seed=None):
+    from mandala_generator import generate_mandala_image
+    from render_cache import open_cache, image_key
+
+    cache = open_cache(config)
+    if cache is not None:
+        key = image_key(config, seed)
+        entry = cache.get_json(key)
+        suffix = os.path.splitext(image_path)[1]
+        if entry is not None and cache.fetch(key, suffix, image_path) and \
+           all(cache.fetch(key, ".svg", path) for path in export_paths or []):
+            return [tuple(item) for item in entry["legend"]] if entry["legend"] else None
+
+    # generate_mandala_image will return legend if color_hint_mode == "number"
+    legend = generate_mandala_image(image_path, export_paths=export_paths, seed=seed, **mandala_options(config))
+    if cache is not None:
+        cache.store(key, suffix, image_path)
+        for path in export_paths or []:
+            cache.store(key, ".svg", path)
+        cache.put_json(key, {"legend": legend})
+    return legend
+
+def uses_native_pdf(config):
+    return config.get("pdf_backend", "latex") == "native"
+
+def render_pdf(config, workdir, pdf_output, seed=None):
+    """
+    Render one mandala inside its own scratch directory and compile it to pdf_output.
+    Emits "page_start" and "page_end" (with ms, success and cached) telemetry events.
+    """
+    # Workers start without the parent's hooks: install them here (once per process)
+    configure(config)
+    emit("page_start", seed=seed, output=pdf_output)
+    with profiled(config, f"page-{seed}"), \
+         timed("page_end", seed=seed, output=pdf_output, success=False, cached=False) as page:
+        page["success"] = build_pdf(config, workdir, pdf_output, seed, page)
+    return page["success"]
+
+def build_pdf(config, workdir, pdf_output, seed, page):
+    from render_cache import open_cache, image_key, pdf_key
+
+    svg_exports = get_svg_exports(config, pdf_output)
+    cache = open_cache(config)
+    if cache is not None:
+        key = pdf_key(config, [image_key(config, seed)])
+        if cache.fetch(key, ".pdf", pdf_output) and \
+           all(cache.fetch(image_key(config, seed), ".svg", path) for path in svg_exports or []):
+            log("INFO", f"{os.path.basename(pdf_output)} found in cache.")
+            page["cached"] = True
+            return True
+
+    if uses_native_pdf(config) and get_image_extension(config) == ".npz":
+        # The native writer draws the scene straight from memory: no scratch files at all
+        from mandala_generator import mandala_page
+        with open(pdf_output, "wb") as f:
+            f.write(mandala_page(seed, ["page"], **mandala_options(config))["page"])
+        if cache is not None:
+            cache.store(key, ".pdf", pdf_output)
+        return True
+
+    os.makedirs(workdir, exist_ok=True)
+    image_path = os.path.join(workdir, "mandala" + get_image_extension(config))
+    latex_file = os.path.join(workdir, "mandala.tex")
+    try:
+        legend = render_image(config, image_path, svg_exports, seed=seed)
+        if uses_native_pdf(config):
+            from pdf_tools import create_pdf_file
+            success = create_pdf_file(image_path, pdf_output, legend=legend, seed=seed)
+        else:
+            from latex_tools import create_latex_file, compile_latex_pdf
+            create_latex_file(image_path, latex_file, legend=legend, seed=seed)
+            success = compile_latex_pdf(latex_file, workdir, pdf_output, **latex_options(config))
+        if success and cache is not None:
+            cache.store(key, ".pdf", pdf_output)
+        return success
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def render_pdf_in_worker(config, pdf_output, seed=None):
+    workdir = os.path.join(TMP_DIR, f"worker{os.getpid()}")
+    return render_pdf(config, workdir, pdf_output, seed)
 
 def ask_config_interactive():
     print("\n--- MANUAL CONFIGURATION ---")
@@ -162,59 +345,241 @@ def convert_legacy_config(config):
 
 def main():
     print("=== AUTOMATIC MANDALA COLORING PDF GENERATOR ===")
-    print("[INFO] Checking Python packages...")
-    check_python_packages()
-    print("[INFO] Checking for pdflatex...")
-    if not check_pdflatex():
-        guide_latex_installation()
+    log("INFO", "Checking Python packages...")
+    probes = load_probes()
+    check_python_packages(probes)
+
+    if len(sys.argv) > 1 and sys.argv[1] == "benchmark":
+        # python main.py benchmark [report.json] [png|pdf]: fixed-seed matrix, independent of config.json
+        from benchmark import run_benchmark, BENCHMARK_OUTPUT
+        save_probes(probes)
+        run_benchmark(sys.argv[2] if len(sys.argv) > 2 else BENCHMARK_OUTPUT,
+                      image_format=sys.argv[3] if len(sys.argv) > 3 else "png")
+        clean_temp_files()
+        return
 
     if os.path.exists(CONFIG_FILE):
-        print(f"[INFO] Configuration found in {CONFIG_FILE}.")
+        log("INFO", f"Configuration found in {CONFIG_FILE}.")
         config = load_config_json(CONFIG_FILE)
     else:
         config = ask_config_interactive()
         save_config_json(config, CONFIG_FILE)
-        print(f"[INFO] Configuration saved in {CONFIG_FILE}.")
+        log("INFO", f"Configuration saved in {CONFIG_FILE}.")
 
     config = convert_legacy_config(config)
+    configure(config)
+    emit("run_start", argv=sys.argv[1:], config=config)
 
-    from mandala_generator import generate_mandala_image
-    from latex_tools import create_latex_file, compile_latex_pdf
+    if not uses_native_pdf(config):
+        log("INFO", "Checking for pdflatex...")
+        if not check_pdflatex(probes):
+            guide_latex_installation()
+        elif config.get("latex_format", True):
+            # Build the precompiled preamble once here rather than in every worker at the same time
+            from latex_tools import latex_format
+            latex_format(LATEX_FORMAT_DIR, latex_options(config)["timeout"])
+    save_probes(probes)
+
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        # Daemon mode: keep warm workers and take jobs over HTTP instead of one batch from config.json
+        from server import serve
+        serve(config, get_worker_count(config), port=sys.argv[2] if len(sys.argv) > 2 else None)
+        return
 
     batch_count = config.get("batch_count", 1)
-    color_hint_mode = config.get("color_hint_mode", "none")
-    color_mode = config.get("color_mode", "basic")
-    mandala_style = config.get("mandala_style", "random")
-    mandala_max_radius = config.get("mandala_max_radius", 1.35)
-
-    print(f"[INFO] Generating {batch_count} PDF(s)...")
-
-    for i in range(batch_count):
-        ensure_dirs()
-        print(f"[INFO] Generating mandala {i+1}/{batch_count}...")
-        legend = None
-        # generate_mandala_image will return legend if color_hint_mode == "number"
-        legend = generate_mandala_image(
-            MANDALA_IMAGE,
-            color_hint_mode=color_hint_mode,
-            color_mode=color_mode,
-            mandala_style=mandala_style,
-            mandala_max_radius=mandala_max_radius
-        )
-        create_latex_file(MANDALA_IMAGE, LATEX_FILE, legend=legend)
-        pdf_filename = get_next_pdf_filename(OUTPUT_DIR)
-        pdf_output = os.path.join(OUTPUT_DIR, pdf_filename)
-        print(f"[INFO] Compiling PDF with LaTeX ({pdf_filename})...")
-        success = compile_latex_pdf(LATEX_FILE, TMP_DIR, pdf_output)
+    workers = min(get_worker_count(config), max(batch_count, 1))
+
+    ensure_dirs()
+    from manifest import Manifest
+    manifest = Manifest(OUTPUT_DIR)
+    if config.get("output_mode", "single") == "book":
+        seeds = get_page_seeds(config, batch_count)
+        failed = 0 if generate_book(config, batch_count, workers, seeds, manifest) else 1
+    else:
+        failed = generate_pages(config, batch_count, workers, manifest)
+
+    clean_temp_files()
+
+    from render_cache import open_cache
+    cache = open_cache(config)
+    if cache is not None:
+        removed = cache.evict()
+        if removed:
+            log("INFO", f"Removed {removed} old file(s) from the render cache.")
+
+    log("DONE", "You can find the final PDFs in the 'output/' folder.")
+    emit("run_end", batch_count=batch_count)
+    if failed and config.get("on_error", "skip") == "stop":
+        # Non-zero exit status so scripts and job runners see the failure
+        sys.exit(1)
+
+def batch_params(config, batch_count):
+    # Everything that makes two runs produce the same pages (apart from the seed)
+    params = mandala_options(config)
+    params.update(image_format=config.get("image_format", "png"), pdf_backend=config.get("pdf_backend", "latex"),
+                  batch_count=batch_count)
+    return params
+
+def start_or_resume_batch(config, batch_count, manifest):
+    """
+    Continue the last unfinished batch with the same parameters, or register a new one in the manifest.
+    """
+    from mandala_generator import new_batch_seed, page_seeds
+
+    params = batch_params(config, batch_count)
+    if config.get("resume", True):
+        batch = manifest.unfinished_batch(params, config.get("seed"))
+        if batch is not None:
+            log("INFO", f"Resuming unfinished batch (seed {batch['seed']}): "
+                  f"{len(batch['pages']) - len(manifest.pending_pages(batch))}/{len(batch['pages'])} page(s) already done.")
+            return batch
 
+    base_seed = config.get("seed")
+    if base_seed is None:
+        base_seed = new_batch_seed()
+    log("INFO", f"Batch seed: {base_seed}")
+    outputs = manifest.allocate(batch_count, used_numbers=get_used_pdf_numbers)
+    return manifest.start_batch(base_seed, params, page_seeds(base_seed, batch_count), outputs)
+
+def generate_pages(config, batch_count, workers, manifest):
+    """
+    Render the pending pages of the batch; returns the number of failed pages.
+    With "on_error": "stop" the batch ends at the first failure (the rest is left for the next run).
+    """
+    stop_on_error = config.get("on_error", "skip") == "stop"
+    failed = 0
+    batch = start_or_resume_batch(config, batch_count, manifest)
+    pending = manifest.pending_pages(batch)
+    log("INFO", f"Generating {len(pending)} PDF(s)...")
+
+    def report(i, success):
+        # The journal line is written as soon as a page is finished, so a crash loses at most the pages in flight
+        manifest.record_page(batch, i, success)
+        seed, pdf_output = batch["pages"][i]
         if success:
-            print(f"[SUCCESS] PDF generated and saved to {pdf_output}")
+            log("SUCCESS", f"PDF generated and saved to {pdf_output} (seed {seed})")
         else:
-            print("[ERROR] Something went wrong during LaTeX compilation.")
+            log("ERROR", "Something went wrong during PDF generation.")
 
-        clean_temp_files()
+    workers = min(workers, max(len(pending), 1))
+    if workers > 1:
+        log("INFO", f"Using {workers} worker processes...")
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(render_pdf_in_worker, config, batch["pages"][i][1], batch["pages"][i][0])
+                       for i in pending]
+            for k, (i, future) in enumerate(zip(pending, futures)):
+                try:
+                    success = future.result()
+                except Exception as e:
+                    log("ERROR", f"Mandala {i+1}/{batch_count}: {e}")
+                    success = False
+                report(i, success)
+                if not success:
+                    failed += 1
+                    if stop_on_error:
+                        pool.shutdown(cancel_futures=True)
+                        # Pages that were already running still finish: journal the ones that succeeded
+                        for j, rest in zip(pending[k+1:], futures[k+1:]):
+                            if not rest.cancelled() and rest.exception() is None and rest.result():
+                                report(j, True)
+                        break
+    else:
+        for i in pending:
+            seed, pdf_output = batch["pages"][i]
+            log("INFO", f"Generating mandala {i+1}/{batch_count}...")
+            if not uses_native_pdf(config):
+                log("INFO", f"Compiling PDF with LaTeX ({os.path.basename(pdf_output)})...")
+            success = render_pdf(config, TMP_DIR, pdf_output, seed)
+            report(i, success)
+            if not success:
+                failed += 1
+                if stop_on_error:
+                    break
+
+    if failed and stop_on_error:
+        log("ERROR", "Batch stopped at the first failed page (on_error: stop); run again to resume it.")
+    else:
+        # A full pass ends the batch, failed pages included: they stay "failed" in the journal,
+        # and the next run starts a new batch instead of retrying them
+        manifest.end_batch(batch)
+    return failed
+
+def generate_book(config, batch_count, workers, seeds, manifest):
+    """
+    Render every mandala first, then compile all of them as pages of one PDF with a single pdflatex run.
+    Returns False if the book could not be generated.
+    """
+    log("INFO", f"Generating a book of {batch_count} page(s)...")
+    book_dir = os.path.join(TMP_DIR, "book")
+    os.makedirs(book_dir, exist_ok=True)
+    image_paths = [os.path.join(book_dir, f"mandala{i+1}" + get_image_extension(config)) for i in range(batch_count)]
+    book_output = manifest.allocate(1, prefix="book", used_numbers=get_used_pdf_numbers)[0]
+    book_base = os.path.splitext(book_output)[0]
+    svg_exports = [get_svg_exports(config, f"{book_base}_{i+1}") for i in range(batch_count)]
 
-    print("[DONE] You can find the final PDFs in the 'output/' folder.")
+    from render_cache import open_cache, image_key, pdf_key
+    cache = open_cache(config)
+    cached = False
+    if cache is not None:
+        image_keys = [image_key(config, seed) for seed in seeds]
+        book_key = pdf_key(config, image_keys)
+        if cache.fetch(book_key, ".pdf", book_output) and \
+           all(cache.fetch(key, ".svg", path) for key, paths in zip(image_keys, svg_exports) for path in paths or []):
+            log("SUCCESS", f"Book found in cache and saved to {book_output}")
+            cached = True
+
+    pages = None
+    if not cached:
+        pages = render_book_images(config, image_paths, svg_exports, seeds, workers)
+        if uses_native_pdf(config):
+            from pdf_tools import create_pdf_book
+            success = create_pdf_book(pages, book_output, seeds=seeds)
+        else:
+            from latex_tools import create_latex_book, compile_latex_pdf
+            latex_file = os.path.join(book_dir, "book.tex")
+            create_latex_book(pages, latex_file, seeds=seeds)
+            log("INFO", f"Compiling PDF with LaTeX ({os.path.basename(book_output)})...")
+            success = compile_latex_pdf(latex_file, book_dir, book_output, **latex_options(config))
+        if not success:
+            log("ERROR", "Something went wrong during PDF generation.")
+            return False
+        if cache is not None:
+            cache.store(book_key, ".pdf", book_output)
+        log("SUCCESS", f"Book generated and saved to {book_output}")
+
+    if config.get("split_pages", False):
+        pdf_outputs = manifest.allocate(batch_count, used_numbers=get_used_pdf_numbers)
+        if uses_native_pdf(config):
+            # The native writer is cheap enough to write every page again on its own
+            # (from the cached images when the book itself came from the cache)
+            from pdf_tools import create_pdf_file
+            pages = pages or render_book_images(config, image_paths, svg_exports, seeds, workers)
+            success = all(create_pdf_file(image_path, pdf_output, legend=legend, seed=seed)
+                          for (image_path, legend), pdf_output, seed in zip(pages, pdf_outputs, seeds))
+        else:
+            from latex_tools import split_pdf_pages
+            success = split_pdf_pages(book_output, pdf_outputs)
+        if success:
+            log("SUCCESS", f"Book split into {batch_count} PDF(s)")
+    return True
+
+def render_book_images(config, image_paths, svg_exports, seeds, workers):
+    """
+    Render the mandala of every book page; returns (image_path, legend) pairs.
+    """
+    batch_count = len(image_paths)
+    if workers > 1:
+        log("INFO", f"Using {workers} worker processes...")
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            legends = list(pool.map(render_image, [config] * batch_count, image_paths, svg_exports, seeds))
+    else:
+        legends = []
+        for i, image_path in enumerate(image_paths):
+            log("INFO", f"Generating mandala {i+1}/{batch_count}...")
+            legends.append(render_image(config, image_path, svg_exports[i], seeds[i]))
+    return list(zip(image_paths, legends))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
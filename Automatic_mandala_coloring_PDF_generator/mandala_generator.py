@@ -1,8 +1,15 @@
+import io
+import math
+import os
+import time
+import itertools
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.patches import Ellipse, Circle, Polygon
-import matplotlib.patheffects as path_effects
-import random
+
+from geometry import (ring_angles, ring_points, regular_polygons, star_polygons, ellipses,
+                      ring_triangles, arc_polygons, radial_segments, spirals)
+from scene import Scene
+from color_assigner import ColorAssigner
+from telemetry import emit
 
 COLOR_NAMES_BASIC = [
     'Red', 'Blue', 'Yellow', 'Green', 'Orange', 'Purple', 'Pink', 'Brown', 'Black', 'White', 'Gray'
@@ -36,384 +43,253 @@ def point_in_polygon(point, polygon):
         px1, py1 = px2, py2
     return inside
 
-def next_number(used):
-    # Returns the next unused integer > 0
-    n = 1
-    used_set = set(used)
-    while n in used_set:
-        n += 1
-    return n
+def get_rng(rng=None, seed=None):
+    # Every draw function takes an explicit numpy Generator; None means a fresh, unseeded one
+    if rng is None:
+        return np.random.default_rng(seed)
+    return rng
+
+def pick(rng, options):
+    # rng.choice() would turn the list into a NumPy array (and break lists of functions)
+    return options[int(rng.integers(len(options)))]
+
+def page_seeds(base_seed, count, start=0):
+    """
+    Independent per-page seeds derived from one batch seed: page i always gets the same seed,
+    so any page can be regenerated alone with generate_mandala_image(..., seed=page_seeds(base, 1, i)[0]).
+    """
+    return [int(np.random.SeedSequence(base_seed, spawn_key=(i,)).generate_state(1, np.uint64)[0])
+            for i in range(start, start + count)]
+
+def new_batch_seed():
+    return int(np.random.SeedSequence().entropy)
 
 # -------------------
 # Small-shape draw functions (kept compatible)
 # -------------------
-def draw_flower(ax, center, r, lw, color_list=None, color_hint_mode="none", color_map=None):
-    circle = Circle(center, r*0.18, edgecolor='black', facecolor='none', lw=lw)
-    ax.add_patch(circle)
-    for i in np.linspace(0.4, 1.0, 3):
-        c = Circle(center, r*i, edgecolor='black', facecolor='none', lw=lw)
-        ax.add_patch(c)
-    num_petals = np.random.choice([10, 12, 14, 16, 18, 20, 24])
-    angles = np.linspace(0, 2*np.pi, num_petals, endpoint=False)
-    for t in angles:
-        petal_center = (center[0] + np.cos(t)*r*0.6, center[1] + np.sin(t)*r*0.6)
-        petal_width = r * np.random.uniform(0.36, 0.62)
-        petal_height = r * np.random.uniform(0.14, 0.26)
-        petal = Ellipse(petal_center, width=petal_width, height=petal_height, angle=np.degrees(t),
-                        edgecolor='black', facecolor='none', lw=lw)
-        ax.add_patch(petal)
+def draw_flower(scene, center, r, lw, color_list=None, color_hint_mode="none", color_map=None, rng=None, colors=None):
+    rng = get_rng(rng)
+    colors = colors or ColorAssigner(color_list, color_hint_mode, rng, color_map)
+    scene.add_circles([center] * 4, r * np.array([0.18, 0.4, 0.7, 1.0]), lw)
+    num_petals = pick(rng, [10, 12, 14, 16, 18, 20, 24])
+    angles = ring_angles(num_petals)
+    petal_centers = ring_points(center, r*0.6, angles)
+    petal_widths = r * rng.uniform(0.36, 0.62, num_petals)
+    petal_heights = r * rng.uniform(0.14, 0.26, num_petals)
+    scene.add_polygons(ellipses(petal_centers, petal_widths, petal_heights, np.degrees(angles)), lw)
     if color_list and color_hint_mode != "none":
-        hint_targets = [center] + [(center[0] + np.cos(t)*r*0.6, center[1] + np.sin(t)*r*0.6) for t in angles]
+        hint_targets = [center] + list(petal_centers)
         for idx, pos in enumerate(hint_targets):
-            color = random.choice(color_list)
-            if color_hint_mode == "name":
-                txt_hint = color
-            else:
-                if color not in color_map:
-                    color_map[color] = next_number(color_map.values())
-                txt_hint = str(color_map[color])
-            txt = ax.text(pos[0], pos[1], txt_hint, fontsize=max(r*12 if idx==0 else r*8, 8),
-                          ha='center', va='center', weight='bold', zorder=10, clip_on=True)
-            txt.set_path_effects([path_effects.Stroke(linewidth=1.4, foreground='white'), path_effects.Normal()])
+            txt_hint = colors.hint(colors.pick())
+            scene.add_label(pos[0], pos[1], txt_hint, max(r*12 if idx==0 else r*8, 8), 1.4, clip=True)
 
 # -------------------
 # Utility: regular polygon points
 # -------------------
 def regular_polygon(center, radius, n_sides, rotation=0.0):
-    cx, cy = center
-    angles = np.linspace(0, 2*np.pi, n_sides, endpoint=False) + rotation
-    return [(cx + np.cos(a)*radius, cy + np.sin(a)*radius) for a in angles]
+    return regular_polygons([center], radius, n_sides, rotation)[0]
 
 # -------------------
 # Utility: star polygon (like 5-point star or general)
 # -------------------
 def star_polygon(center, outer_r, inner_r, n_points, rotation=0.0):
-    pts = []
-    for i in range(2*n_points):
-        ang = rotation + i * np.pi / n_points
-        r = outer_r if i % 2 == 0 else inner_r
-        pts.append((center[0] + np.cos(ang)*r, center[1] + np.sin(ang)*r))
-    return pts
+    return star_polygons([center], outer_r, inner_r, n_points, rotation)[0]
 
 # -------------------
 # New: richer center-shape generators for easy_mandala
 # -------------------
-def draw_center_polygons(ax, center, r, lw):
+def draw_center_polygons(scene, center, r, lw, rng=None):
+    rng = get_rng(rng)
     # choose one of several center styles
-    style = random.choice(['regular_polygon', 'nested_polygons', 'star_composite', 'triangles', 'concentric_slices'])
+    style = pick(rng, ['regular_polygon', 'nested_polygons', 'star_composite', 'triangles', 'concentric_slices'])
     if style == 'regular_polygon':
-        n = random.choice([6,7,8,9,10,12])
-        pts = regular_polygon(center, r*0.28, n, rotation=random.uniform(0, 2*np.pi))
-        ax.add_patch(Polygon(pts, closed=True, edgecolor='black', facecolor='none', lw=lw*1.1))
+        n = pick(rng, [6,7,8,9,10,12])
+        scene.add_polygons(regular_polygons([center], r*0.28, n, rotations=rng.uniform(0, 2*np.pi)), lw*1.1)
     elif style == 'nested_polygons':
-        base_n = random.choice([5,6,7,8])
-        for i in range(1, random.randint(2,4)):
-            pts = regular_polygon(center, r*0.12*i, base_n + i, rotation=random.uniform(0, 2*np.pi))
-            ax.add_patch(Polygon(pts, closed=True, edgecolor='black', facecolor='none', lw=max(lw*(1.0 - 0.12*i),0.6)))
+        base_n = pick(rng, [5,6,7,8])
+        for i in range(1, rng.integers(2, 5)):
+            scene.add_polygons(regular_polygons([center], r*0.12*i, base_n + i, rotations=rng.uniform(0, 2*np.pi)),
+                            max(lw*(1.0 - 0.12*i),0.6))
     elif style == 'star_composite':
-        n = random.choice([5,6,7,8])
-        outer = star_polygon(center, r*0.34, r*0.14, n, rotation=random.uniform(0, 2*np.pi))
-        ax.add_patch(Polygon(outer, closed=True, edgecolor='black', facecolor='none', lw=lw))
+        n = pick(rng, [5,6,7,8])
+        scene.add_polygons(star_polygons([center], r*0.34, r*0.14, n, rotations=rng.uniform(0, 2*np.pi)), lw)
         # overlay rotated triangles to create composite star
-        for k in range(random.randint(2,4)):
-            tri = regular_polygon(center, r*0.23, 3, rotation=random.uniform(0, 2*np.pi))
-            ax.add_patch(Polygon(tri, closed=True, edgecolor='black', facecolor='none', lw=lw*0.9))
+        n_tri = rng.integers(2, 5)
+        rotations = [rng.uniform(0, 2*np.pi) for _ in range(n_tri)]
+        scene.add_polygons(regular_polygons([center] * n_tri, r*0.23, 3, rotations=rotations), lw*0.9)
     elif style == 'triangles':
         # star-of-triangles (like many mandalas)
-        n = random.choice([6,8])
-        for i in range(n):
-            ang = i * 2*np.pi / n
-            p0 = (center[0] + np.cos(ang) * r*0.12, center[1] + np.sin(ang) * r*0.12)
-            p1 = (center[0] + np.cos(ang + 0.05) * r*0.32, center[1] + np.sin(ang + 0.05) * r*0.32)
-            p2 = (center[0] + np.cos(ang - 0.05) * r*0.32, center[1] + np.sin(ang - 0.05) * r*0.32)
-            ax.add_patch(Polygon([p0,p1,p2], closed=True, edgecolor='black', facecolor='none', lw=lw*0.9))
+        n = pick(rng, [6,8])
+        scene.add_polygons(ring_triangles(center, ring_angles(n), r*0.12, r*0.32, 0.05), lw*0.9)
     elif style == 'concentric_slices':
-        slices = random.choice([6,8,10])
-        pts = regular_polygon(center, r*0.28, slices, rotation=random.uniform(0,2*np.pi))
-        ax.add_patch(Polygon(pts, closed=True, edgecolor='black', facecolor='none', lw=lw))
-        for i in range(1,3):
-            circ = Circle(center, r*0.08*i, edgecolor='black', facecolor='none', lw=lw*0.9)
-            ax.add_patch(circ)
+        slices = pick(rng, [6,8,10])
+        scene.add_polygons(regular_polygons([center], r*0.28, slices, rotations=rng.uniform(0,2*np.pi)), lw)
+        scene.add_circles([center] * 2, r * np.array([0.08, 0.16]), lw*0.9)
 
 # -------------------
 # Updated easy_mandala drawer (more varied)
 # -------------------
-def draw_easy_mandala(ax, center, r, lw, color_list=None, color_hint_mode="none", color_map=None,
-                      n_sectors=None, n_star_points=None, n_petals=None, outer_circles=None):
+def draw_easy_mandala(scene, center, r, lw, color_list=None, color_hint_mode="none", color_map=None,
+                      n_sectors=None, n_star_points=None, n_petals=None, outer_circles=None, rng=None, colors=None):
+    rng = get_rng(rng)
+    colors = colors or ColorAssigner(color_list, color_hint_mode, rng, color_map)
     # Decide counts if not provided
     if n_sectors is None:
-        n_sectors = random.choice([6,8,9,10])
+        n_sectors = pick(rng, [6,8,9,10])
     if n_petals is None:
-        n_petals = random.choice([12,16,20])
+        n_petals = pick(rng, [12,16,20])
     if outer_circles is None:
         outer_circles = n_petals
 
     # 1) center complex shapes (new richer generator)
-    draw_center_polygons(ax, center, r, lw)
+    draw_center_polygons(scene, center, r, lw, rng=rng)
 
     # 2) inner polygon or wheel divided into sectors, draw sector spokes
     inner_radius = r * 0.28
-    theta = np.linspace(0, 2*np.pi, n_sectors, endpoint=False)
+    theta = ring_angles(n_sectors)
     # optionally draw a central regular polygon (with lines splitting sectors)
-    poly_pts = regular_polygon(center, inner_radius, n_sectors, rotation=random.uniform(0,2*np.pi))
-    ax.add_patch(Polygon(poly_pts, closed=True, edgecolor='black', facecolor='none', lw=lw))
-    for t in theta:
-        x1 = center[0] + np.cos(t) * inner_radius
-        y1 = center[1] + np.sin(t) * inner_radius
-        ax.plot([center[0], x1], [center[1], y1], color='black', lw=lw)
+    scene.add_polygons(regular_polygons([center], inner_radius, n_sectors, rotations=rng.uniform(0,2*np.pi)), lw)
+    scene.add_lines(radial_segments(center, theta, 0.0, inner_radius), lw)
 
     # Number sectors (place numbers near middle of each wedge)
-    for i, t in enumerate(theta):
-        mid_angle = t + (np.pi / n_sectors)
-        px = center[0] + np.cos(mid_angle) * (inner_radius * 0.55)
-        py = center[1] + np.sin(mid_angle) * (inner_radius * 0.55)
-        if color_list and color_hint_mode != "none":
-            color = random.choice(color_list)
-            if color_hint_mode == "name":
-                txt_hint = color
-            else:
-                if color not in color_map:
-                    color_map[color] = next_number(color_map.values())
-                txt_hint = str(color_map[color])
-            txt = ax.text(px, py, txt_hint, fontsize=max(r*7, 8), ha='center', va='center', weight='bold', zorder=12)
-            txt.set_path_effects([path_effects.Stroke(linewidth=1.1, foreground='white'), path_effects.Normal()])
+    if color_list and color_hint_mode != "none":
+        for px, py in ring_points(center, inner_radius * 0.55, theta + (np.pi / n_sectors)):
+            txt_hint = colors.hint(colors.pick())
+            scene.add_label(px, py, txt_hint, max(r*7, 8), 1.1, zorder=12)
 
     # 3) intermediate ring: choose between petals, rounded ovals, or small stars
-    choice = random.choice(['petals', 'ovals', 'tiny_stars', 'layered_petals'])
+    choice = pick(rng, ['petals', 'ovals', 'tiny_stars', 'layered_petals'])
     petal_r = r * 0.48
     petal_width = r * 0.28
     petal_height = r * 0.58
-    angles = np.linspace(0, 2*np.pi, n_petals, endpoint=False)
+    angles = ring_angles(n_petals)
     if choice == 'petals':
-        for ang in angles:
-            cx = center[0] + np.cos(ang) * petal_r
-            cy = center[1] + np.sin(ang) * petal_r
-            petal = Ellipse((cx, cy), width=petal_width, height=petal_height, angle=np.degrees(ang),
-                            edgecolor='black', facecolor='none', lw=lw)
-            ax.add_patch(petal)
+        scene.add_polygons(ellipses(ring_points(center, petal_r, angles), petal_width, petal_height,
+                                 np.degrees(angles)), lw)
     elif choice == 'ovals':
-        for ang in angles:
-            cx = center[0] + np.cos(ang) * petal_r
-            cy = center[1] + np.sin(ang) * petal_r
-            petal = Ellipse((cx, cy), width=petal_width*0.9, height=petal_height*0.7, angle=np.degrees(ang),
-                            edgecolor='black', facecolor='none', lw=lw)
-            ax.add_patch(petal)
+        scene.add_polygons(ellipses(ring_points(center, petal_r, angles), petal_width*0.9, petal_height*0.7,
+                                 np.degrees(angles)), lw)
     elif choice == 'tiny_stars':
         # small star-like triangles around ring
-        for ang in angles:
-            tri = regular_polygon((center[0] + np.cos(ang)*petal_r, center[1] + np.sin(ang)*petal_r),
-                                  r*0.12, 3, rotation=ang)
-            ax.add_patch(Polygon(tri, closed=True, edgecolor='black', facecolor='none', lw=lw*0.9))
+        scene.add_polygons(regular_polygons(ring_points(center, petal_r, angles), r*0.12, 3, rotations=angles), lw*0.9)
     elif choice == 'layered_petals':
         for k in range(2):
-            for ang in angles:
-                cx = center[0] + np.cos(ang) * (petal_r * (0.9 - k*0.18))
-                cy = center[1] + np.sin(ang) * (petal_r * (0.9 - k*0.18))
-                petal = Ellipse((cx, cy), width=petal_width*(0.9 - k*0.18), height=petal_height*(0.9 - k*0.18),
-                                angle=np.degrees(ang), edgecolor='black', facecolor='none', lw=lw*0.9)
-                ax.add_patch(petal)
+            scale = 0.9 - k*0.18
+            scene.add_polygons(ellipses(ring_points(center, petal_r*scale, angles), petal_width*scale,
+                                     petal_height*scale, np.degrees(angles)), lw*0.9)
 
     # 4) outer rim: circles or small polygons with numbering
     rim_r = r * 0.87
     circle_radius = r * 0.045
-    angles_circles = np.linspace(0, 2*np.pi, outer_circles, endpoint=False)
-    for ang in angles_circles:
-        cx = center[0] + np.cos(ang) * rim_r
-        cy = center[1] + np.sin(ang) * rim_r
-        # sometimes draw circle, sometimes small star/polygon
-        if random.random() > 0.2:
-            circ = Circle((cx, cy), circle_radius, edgecolor='black', facecolor='none', lw=lw)
-            ax.add_patch(circ)
-        else:
-            # small polygon (square/triangle) for variety
-            small = regular_polygon((cx, cy), circle_radius*1.1, random.choice([3,4]), rotation=random.uniform(0,2*np.pi))
-            ax.add_patch(Polygon(small, closed=True, edgecolor='black', facecolor='none', lw=lw*0.9))
-        if color_list and color_hint_mode != "none":
-            color = random.choice(color_list)
-            if color_hint_mode == "name":
-                txt_hint = color
-            else:
-                if color not in color_map:
-                    color_map[color] = next_number(color_map.values())
-                txt_hint = str(color_map[color])
-            txt = ax.text(cx, cy, txt_hint, fontsize=max(r*6, 7), ha='center', va='center', weight='bold', zorder=11)
-            txt.set_path_effects([path_effects.Stroke(linewidth=0.9, foreground='white'), path_effects.Normal()])
+    rim_centers = ring_points(center, rim_r, ring_angles(outer_circles))
+    # sometimes draw circle, sometimes small star/polygon
+    is_circle = np.array([rng.random() > 0.2 for _ in range(outer_circles)])
+    scene.add_circles(rim_centers[is_circle], circle_radius, lw)
+    # small polygon (square/triangle) for variety
+    sides = np.array([pick(rng, [3,4]) for _ in range(outer_circles)])
+    for n_sides in (3, 4):
+        mask = ~is_circle & (sides == n_sides)
+        rotations = [rng.uniform(0,2*np.pi) for _ in range(mask.sum())]
+        scene.add_polygons(regular_polygons(rim_centers[mask], circle_radius*1.1, n_sides, rotations=rotations), lw*0.9)
+    if color_list and color_hint_mode != "none":
+        for cx, cy in rim_centers:
+            txt_hint = colors.hint(colors.pick())
+            scene.add_label(cx, cy, txt_hint, max(r*6, 7), 0.9, zorder=11)
 
     # 5) optional decorative rings / circles
     for rr in [0.36, 0.55, 0.72]:
-        if random.random() > 0.3:
-            ax.add_patch(Circle(center, r*rr, edgecolor='black', facecolor='none', lw=lw*0.8))
+        if rng.random() > 0.3:
+            scene.add_circles([center], r*rr, lw*0.8)
 
 # -------------------
 # Other mandala functions remain the same (draw_geometric_mandala etc.)
 # -------------------
-def draw_spiral(ax, center, r, lw, color_list=None, color_hint_mode="none", color_map=None):
-    n_turns = np.random.randint(4, 9)
+def draw_spiral(scene, center, r, lw, color_list=None, color_hint_mode="none", color_map=None, rng=None, colors=None):
+    rng = get_rng(rng)
+    colors = colors or ColorAssigner(color_list, color_hint_mode, rng, color_map)
+    n_turns = rng.integers(4, 9)
     theta = np.linspace(0, n_turns * 2 * np.pi, 120)
-    a = r*0.18
-    b = r*0.13
-    x = center[0] + (a + b * theta/(2*np.pi)) * np.cos(theta)
-    y = center[1] + (a + b * theta/(2*np.pi)) * np.sin(theta)
-    ax.plot(x, y, color='black', lw=lw)
-    for i in np.linspace(0.4, 1.0, 3):
-        c = Circle(center, r*i, edgecolor='black', facecolor='none', lw=lw)
-        ax.add_patch(c)
+    spiral = spirals([center], r*0.18, r*0.13, theta)
+    x, y = spiral[0, :, 0], spiral[0, :, 1]
+    scene.add_lines(spiral, lw)
+    scene.add_circles([center] * 3, r * np.linspace(0.4, 1.0, 3), lw)
     if color_list and color_hint_mode != "none":
-        n_colors = np.random.randint(1, 4)
+        n_colors = rng.integers(1, 4)
         steps = np.linspace(0.15, 0.85, n_colors)
         for s in steps:
             idx_pt = int(s * len(theta))
-            color = random.choice(color_list)
-            if color_hint_mode == "name":
-                txt_hint = color
-            elif color_hint_mode == "number":
-                if color not in color_map:
-                    color_map[color] = next_number(color_map.values())
-                txt_hint = str(color_map[color])
-            else:
-                continue
-            txt = ax.text(x[idx_pt], y[idx_pt], txt_hint, fontsize=max(r*11, 9), color='black',
-                          ha='center', va='center', weight='bold', zorder=10)
-            txt.set_path_effects([path_effects.Stroke(linewidth=1.3, foreground='white'), path_effects.Normal()])
-
-def draw_leaf(ax, center, r, lw, color_list=None, color_hint_mode="none", color_map=None):
-    num_leaves = np.random.choice([3, 4, 5])
-    angles = np.linspace(0, 2*np.pi, num_leaves, endpoint=False)
-    for t in angles:
-        dx = np.cos(t)
-        dy = np.sin(t)
-        leaf_center = (center[0] + dx*r*0.45, center[1] + dy*r*0.45)
-        leaf_width = r * np.random.uniform(0.22, 0.32)
-        leaf_height = r * np.random.uniform(0.33, 0.48)
-        leaf = Ellipse(leaf_center, width=leaf_width, height=leaf_height, angle=np.degrees(t)+90,
-                       edgecolor='black', facecolor='none', lw=lw)
-        ax.add_patch(leaf)
-        ax.plot([center[0], leaf_center[0]], [center[1], leaf_center[1]], color='black', lw=lw*0.5)
-        if color_list and color_hint_mode != "none":
-            color = random.choice(color_list)
-            if color_hint_mode == "name":
-                txt_hint = color
-            elif color_hint_mode == "number":
-                if color not in color_map:
-                    color_map[color] = next_number(color_map.values())
-                txt_hint = str(color_map[color])
-            else:
-                continue
-            txt = ax.text(leaf_center[0], leaf_center[1], txt_hint, fontsize=max(leaf_height*12, 8), color='black',
-                          ha='center', va='center', weight='bold', zorder=10, rotation=np.degrees(t), clip_on=True)
-            txt.set_path_effects([path_effects.Stroke(linewidth=1.0, foreground='white'), path_effects.Normal()])
-    circle = Circle(center, r*0.13, edgecolor='black', facecolor='none', lw=lw)
-    ax.add_patch(circle)
+            txt_hint = colors.hint(colors.pick())
+            scene.add_label(x[idx_pt], y[idx_pt], txt_hint, max(r*11, 9), 1.3)
+
+def draw_leaf(scene, center, r, lw, color_list=None, color_hint_mode="none", color_map=None, rng=None, colors=None):
+    rng = get_rng(rng)
+    colors = colors or ColorAssigner(color_list, color_hint_mode, rng, color_map)
+    num_leaves = pick(rng, [3, 4, 5])
+    angles = ring_angles(num_leaves)
+    leaf_centers = ring_points(center, r*0.45, angles)
+    leaf_widths = r * rng.uniform(0.22, 0.32, num_leaves)
+    leaf_heights = r * rng.uniform(0.33, 0.48, num_leaves)
+    scene.add_polygons(ellipses(leaf_centers, leaf_widths, leaf_heights, np.degrees(angles)+90), lw)
+    scene.add_lines(radial_segments(center, angles, 0.0, r*0.45), lw*0.5)
     if color_list and color_hint_mode != "none":
-        color = random.choice(color_list)
-        if color_hint_mode == "name":
-            txt_hint = color
-        elif color_hint_mode == "number":
-            if color not in color_map:
-                color_map[color] = next_number(color_map.values())
-            txt_hint = str(color_map[color])
-        else:
-            return
-        txt = ax.text(center[0], center[1], txt_hint, fontsize=max(r*9, 7), color='black',
-                      ha='center', va='center', weight='bold', zorder=10)
-        txt.set_path_effects([path_effects.Stroke(linewidth=1.2, foreground='white'), path_effects.Normal()])
-
-def draw_ray_mandala(ax, center, r, lw, color_list=None, color_hint_mode="none", color_map=None):
-    num_rays = np.random.choice([20, 24, 28, 32])
-    angles = np.linspace(0, 2*np.pi, num_rays, endpoint=False)
-    for t in angles:
-        dx = np.cos(t)
-        dy = np.sin(t)
-        x0 = center[0] + dx*r*0.22
-        y0 = center[1] + dy*r*0.22
-        x1 = center[0] + dx*r*0.95
-        y1 = center[1] + dy*r*0.95
-        ax.plot([x0, x1], [y0, y1], color='black', lw=lw*0.7)
-        a = r*0.08
-        b = r*0.05
-        theta = np.linspace(0, 2*np.pi, 60)
-        xs = x0 + (a + b * theta/(2*np.pi)) * np.cos(theta + t)
-        ys = y0 + (a + b * theta/(2*np.pi)) * np.sin(theta + t)
-        ax.plot(xs, ys, color='black', lw=lw*0.5)
-    for i in np.linspace(0.33, 1.0, 4):
-        c = Circle(center, r*i, edgecolor='black', facecolor='none', lw=lw)
-        ax.add_patch(c)
+        for t, leaf_center, leaf_height in zip(angles, leaf_centers, leaf_heights):
+            txt_hint = colors.hint(colors.pick())
+            scene.add_label(leaf_center[0], leaf_center[1], txt_hint, max(leaf_height*12, 8), 1.0, rotation=np.degrees(t), clip=True)
+    scene.add_circles([center], r*0.13, lw)
     if color_list and color_hint_mode != "none":
-        color = random.choice(color_list)
-        if color_hint_mode == "name":
-            txt_hint = color
-        elif color_hint_mode == "number":
-            if color not in color_map:
-                color_map[color] = next_number(color_map.values())
-            txt_hint = str(color_map[color])
-        else:
-            return
-        txt = ax.text(center[0], center[1], txt_hint, fontsize=max(r*15, 11), color='black',
-                      ha='center', va='center', weight='bold', zorder=10)
-        txt.set_path_effects([path_effects.Stroke(linewidth=1.5, foreground='white'), path_effects.Normal()])
-        n_ext_colors = np.random.randint(1, 6)
-        ext_angles = np.linspace(0, 2*np.pi, n_ext_colors+1)[:-1] + np.random.uniform(-0.25, 0.25, n_ext_colors)
+        txt_hint = colors.hint(colors.pick())
+        scene.add_label(center[0], center[1], txt_hint, max(r*9, 7), 1.2)
+
+def draw_ray_mandala(scene, center, r, lw, color_list=None, color_hint_mode="none", color_map=None, rng=None, colors=None):
+    rng = get_rng(rng)
+    colors = colors or ColorAssigner(color_list, color_hint_mode, rng, color_map)
+    num_rays = pick(rng, [20, 24, 28, 32])
+    angles = ring_angles(num_rays)
+    scene.add_lines(radial_segments(center, angles, r*0.22, r*0.95), lw*0.7)
+    # a small spiral curling out of the inner end of every ray
+    ray_starts = ring_points(center, r*0.22, angles)
+    scene.add_lines(spirals(ray_starts, r*0.08, r*0.05, np.linspace(0, 2*np.pi, 60), rotations=angles), lw*0.5)
+    scene.add_circles([center] * 4, r * np.linspace(0.33, 1.0, 4), lw)
+    if color_list and color_hint_mode != "none":
+        txt_hint = colors.hint(colors.pick())
+        scene.add_label(center[0], center[1], txt_hint, max(r*15, 11), 1.5)
+        n_ext_colors = rng.integers(1, 6)
+        ext_angles = np.linspace(0, 2*np.pi, n_ext_colors+1)[:-1] + rng.uniform(-0.25, 0.25, n_ext_colors)
         for ang in ext_angles:
             dx = np.cos(ang)
             dy = np.sin(ang)
             ext_x = center[0] + dx * r * 0.85
             ext_y = center[1] + dy * r * 1.10
-            color = random.choice(color_list)
-            if color_hint_mode == "name":
-                txt_hint = color
-            elif color_hint_mode == "number":
-                if color not in color_map:
-                    color_map[color] = next_number(color_map.values())
-                txt_hint = str(color_map[color])
-            else:
-                continue
-            txt = ax.text(ext_x, ext_y, txt_hint, fontsize=max(r*10, 8), color='black',
-                          ha='center', va='center', weight='bold', zorder=10)
-            txt.set_path_effects([path_effects.Stroke(linewidth=1.3, foreground='white'), path_effects.Normal()])
-
-def draw_geometric_mandala(ax, center, r_max, lw, color_list=None, color_hint_mode="none", color_map=None):
-    levels = np.random.randint(4, 7)
+            txt_hint = colors.hint(colors.pick())
+            scene.add_label(ext_x, ext_y, txt_hint, max(r*10, 8), 1.3)
+
+def draw_geometric_mandala(scene, center, r_max, lw, color_list=None, color_hint_mode="none", color_map=None, rng=None, colors=None):
+    rng = get_rng(rng)
+    colors = colors or ColorAssigner(color_list, color_hint_mode, rng, color_map)
+    levels = rng.integers(4, 7)
     shapes_drawn = []
     for level in range(1, levels+1):
         radius = r_max * (level/levels)
-        shape_type = np.random.choice(['polygon', 'petal', 'triangle'])
-        n_shapes = np.random.choice([8, 10, 12, 14, 16, 18, 20])
-        angles = np.linspace(0, 2*np.pi, n_shapes, endpoint=False)
+        shape_type = pick(rng, ['polygon', 'petal', 'triangle'])
+        n_shapes = pick(rng, [8, 10, 12, 14, 16, 18, 20])
+        angles = ring_angles(n_shapes)
         if shape_type == 'polygon':
-            for ang in angles:
-                points = []
-                for k in range(5):
-                    th = ang + (2*np.pi*k/n_shapes)
-                    points.append([center[0] + np.cos(th)*radius,
-                                   center[1] + np.sin(th)*radius])
-                poly = Polygon(points, closed=True, edgecolor='black', facecolor='none', lw=lw)
-                ax.add_patch(poly)
-                shapes_drawn.append(('polygon', points))
+            verts = arc_polygons(center, radius, angles, 2*np.pi/n_shapes, 5)
+            scene.add_polygons(verts, lw)
+            shapes_drawn.extend(('polygon', points) for points in verts)
         elif shape_type == 'triangle':
-            for ang in angles:
-                p0 = [center[0] + np.cos(ang)*radius, center[1] + np.sin(ang)*radius]
-                p1 = [center[0] + np.cos(ang + np.pi/n_shapes)*radius*0.87,
-                      center[1] + np.sin(ang + np.pi/n_shapes)*radius*0.87]
-                p2 = [center[0] + np.cos(ang - np.pi/n_shapes)*radius*0.87,
-                      center[1] + np.sin(ang - np.pi/n_shapes)*radius*0.87]
-                tri = Polygon([p0, p1, p2], closed=True, edgecolor='black', facecolor='none', lw=lw)
-                ax.add_patch(tri)
-                shapes_drawn.append(('triangle', [p0, p1, p2]))
+            verts = ring_triangles(center, angles, radius, radius*0.87, np.pi/n_shapes)
+            scene.add_polygons(verts, lw)
+            shapes_drawn.extend(('triangle', points) for points in verts)
         elif shape_type == 'petal':
-            for ang in angles:
-                dx = np.cos(ang)
-                dy = np.sin(ang)
-                petal_center = (center[0] + dx*radius, center[1] + dy*radius)
-                petal_width = radius * 0.38
-                petal_height = radius * 0.87
-                petal = Ellipse(petal_center, width=petal_width, height=petal_height, angle=np.degrees(ang),
-                                edgecolor='black', facecolor='none', lw=lw)
-                ax.add_patch(petal)
-                shapes_drawn.append(('petal', petal_center, petal_width, petal_height, np.degrees(ang)))
-        c = Circle(center, radius, edgecolor='black', facecolor='none', lw=lw)
-        ax.add_patch(c)
-    c = Circle(center, r_max*0.12, edgecolor='black', facecolor='none', lw=lw)
-    ax.add_patch(c)
+            petal_centers = ring_points(center, radius, angles)
+            petal_width = radius * 0.38
+            petal_height = radius * 0.87
+            scene.add_polygons(ellipses(petal_centers, petal_width, petal_height, np.degrees(angles)), lw)
+            shapes_drawn.extend(('petal', tuple(pc), petal_width, petal_height, np.degrees(ang))
+                                for pc, ang in zip(petal_centers, angles))
+        scene.add_circles([center], radius, lw)
+    scene.add_circles([center], r_max*0.12, lw)
 
     all_points = []
     for shape in shapes_drawn:
@@ -427,8 +303,7 @@ def draw_geometric_mandala(ax, center, r_max, lw, color_list=None, color_hint_mo
     y_min, y_max = all_points[:, 1].min(), all_points[:, 1].max()
 
     margin = 0.04 * r_max
-    ax.set_xlim(x_min-margin, x_max+margin)
-    ax.set_ylim(y_min-margin, y_max+margin)
+    scene.set_limits((x_min-margin, x_max+margin), (y_min-margin, y_max+margin))
 
     if color_list and color_hint_mode != "none":
         for shape in shapes_drawn:
@@ -437,147 +312,336 @@ def draw_geometric_mandala(ax, center, r_max, lw, color_list=None, color_hint_mo
                 cx, cy = centroid(pts)
                 if point_in_polygon((cx, cy), pts) and \
                    (x_min+margin < cx < x_max-margin) and (y_min+margin < cy < y_max-margin):
-                    color = random.choice(color_list)
-                    if color_hint_mode == "name":
-                        txt_hint = color
-                    elif color_hint_mode == "number":
-                        if color not in color_map:
-                            color_map[color] = next_number(color_map.values())
-                        txt_hint = str(color_map[color])
-                    else:
-                        continue
-                    txt = ax.text(cx, cy, txt_hint, fontsize=9, color='black',
-                                  ha='center', va='center', weight='bold', zorder=10, clip_on=True)
-                    txt.set_path_effects([path_effects.Stroke(linewidth=1.2, foreground='white'), path_effects.Normal()])
+                    txt_hint = colors.hint(colors.pick())
+                    scene.add_label(cx, cy, txt_hint, 9, 1.2, clip=True)
             elif shape[0] == 'petal':
                 cx, cy = shape[1]
                 angle = shape[4]
                 if (x_min+margin < cx < x_max-margin) and (y_min+margin < cy < y_max-margin):
-                    color = random.choice(color_list)
-                    if color_hint_mode == "name":
-                        txt_hint = color
-                    elif color_hint_mode == "number":
-                        if color not in color_map:
-                            color_map[color] = next_number(color_map.values())
-                        txt_hint = str(color_map[color])
-                    else:
-                        continue
-                    txt = ax.text(cx, cy, txt_hint, fontsize=9, color='black',
-                                  ha='center', va='center', weight='bold', zorder=10, rotation=angle, clip_on=True)
-                    txt.set_path_effects([path_effects.Stroke(linewidth=1.0, foreground='white'), path_effects.Normal()])
+                    txt_hint = colors.hint(colors.pick())
+                    scene.add_label(cx, cy, txt_hint, 9, 1.0, rotation=angle, clip=True)
         if (x_min+margin < center[0] < x_max-margin) and (y_min+margin < center[1] < y_max-margin):
-            color = random.choice(color_list)
-            if color_hint_mode == "name":
-                txt_hint = color
-            elif color_hint_mode == "number":
-                if color not in color_map:
-                    color_map[color] = next_number(color_map.values())
-                txt_hint = str(color_map[color])
-            else:
-                txt_hint = None
-            if txt_hint:
-                txt = ax.text(center[0], center[1], txt_hint, fontsize=10, color='black',
-                              ha='center', va='center', weight='bold', zorder=10)
-                txt.set_path_effects([path_effects.Stroke(linewidth=1.8, foreground='white'), path_effects.Normal()])
+            txt_hint = colors.hint(colors.pick())
+            scene.add_label(center[0], center[1], txt_hint, 10, 1.8)
 
 def flower_can_fit(new_center, new_r, centers, radii, min_overlap=0.32):
-    for (c, r) in zip(centers, radii):
-        dist = np.hypot(c[0]-new_center[0], c[1]-new_center[1])
-        allowed = (new_r + r) * min_overlap
-        if dist < (new_r + r - allowed):
-            return False
-    return True
-
-def generate_mandala_image(output_path, color_hint_mode="none", color_mode="advanced", mandala_style="random", mandala_max_radius=1.35):
+    # Two circles clash when they are closer than (r1 + r2) * (1 - min_overlap)
+    if len(centers) == 0:
+        return True
+    centers = np.asarray(centers, dtype=float).reshape(-1, 2)
+    dist = np.hypot(centers[:, 0] - new_center[0], centers[:, 1] - new_center[1])
+    return not np.any(dist < (new_r + np.asarray(radii, dtype=float)) * (1 - min_overlap))
+
+class CircleIndex:
+    """
+    Uniform grid over the placed circles, so a fit test only looks at the neighbouring cells
+    instead of every circle already on the page.
+    """
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.centers = []
+        self.radii = []
+        self.max_r = 0.0
+
+    def __len__(self):
+        return len(self.centers)
+
+    def cell(self, x, y):
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def can_fit(self, center, r, min_overlap):
+        if not self.centers:
+            return True
+        # No clash is possible beyond r + max_r, so only those cells are searched
+        reach = r + self.max_r
+        x0, y0 = self.cell(center[0] - reach, center[1] - reach)
+        x1, y1 = self.cell(center[0] + reach, center[1] + reach)
+        near = [i for ix in range(x0, x1 + 1) for iy in range(y0, y1 + 1) for i in self.cells.get((ix, iy), ())]
+        if len(near) > 32:
+            return flower_can_fit(center, r, [self.centers[i] for i in near], [self.radii[i] for i in near], min_overlap)
+        # Few neighbours: plain floats beat the cost of building NumPy arrays
+        keep = 1 - min_overlap
+        for i in near:
+            c = self.centers[i]
+            if math.hypot(c[0] - center[0], c[1] - center[1]) < (r + self.radii[i]) * keep:
+                return False
+        return True
+
+    def add(self, center, r):
+        self.cells.setdefault(self.cell(*center), []).append(len(self.centers))
+        self.centers.append(center)
+        self.radii.append(r)
+        self.max_r = max(self.max_r, r)
+
+def random_layout(n_elements, min_elements, half_width=0.97, half_height=1.35, r_min=0.34, r_max=0.68,
+                  max_tries=4000, min_overlap=0.33, fallback_r=(0.28, 0.38), chunk=256, rng=None):
+    """
+    Rejection-sample non-overlapping circles inside [-half_width, half_width] x [-half_height, half_height].
+    After max_tries // 2 tries the overlap allowance grows and r_max shrinks; if fewer than min_elements fit,
+    a fallback pass with small circles and a looser overlap runs until max_tries * 2.
+    Returns (centers, radii, tries).
+    """
+    rng = get_rng(rng)
+    index = CircleIndex(cell_size=2 * max(r_max, fallback_r[1]))
+    tries = 0
+    # Uniform draws are made in chunks: one NumPy call per chunk instead of three per try
+    draws = []
+
+    def next_draw():
+        if not draws:
+            draws.extend(rng.uniform(0.0, 1.0, (chunk, 3)).tolist()[::-1])
+        return draws.pop()
+
+    def candidate(lo, hi):
+        u = next_draw()
+        r = lo + u[0] * (hi - lo)
+        x = -half_width + r + u[1] * (2 * (half_width - r))
+        y = -half_height + r + u[2] * (2 * (half_height - r))
+        return (x, y), r
+
+    while len(index) < n_elements and tries < max_tries:
+        if tries > max_tries // 2 and min_overlap < 0.48:
+            min_overlap += 0.01
+            r_max -= 0.01
+        tries += 1
+        new_center, r = candidate(r_min, r_max)
+        if index.can_fit(new_center, r, min_overlap):
+            index.add(new_center, r)
+
+    while len(index) < min_elements and tries < max_tries*2:
+        tries += 1
+        new_center, r = candidate(*fallback_r)
+        if index.can_fit(new_center, r, min_overlap*0.8):
+            index.add(new_center, r)
+
+    return index.centers, index.radii, tries
+
+def add_region_hints(scene, colors, adjacent_colors="random"):
+    """
+    One hint per closed region of the finished outlines, at the point farthest from its borders
+    (see regions.py), instead of the positions each draw function guesses from its own shapes.
+    adjacent_colors: "random" picks every region's color on its own, "different" never gives two
+    neighboring regions the same color (as long as the palette and max_colors allow it).
+    """
+    from regions import hint_spots, hint_size
+
+    spots, edges = hint_spots(scene)
+    # Only regions with room for a hint get a color (numbers are at most two digits wide)
+    shortest = min(colors.palette, key=len) if colors.hint_mode == "name" else "00"
+    keep = [i for i, (_, _, radius) in enumerate(spots) if hint_size(shortest, radius)]
+    # Color names differ in length: a region only gets a color whose name fits in it, so no color
+    # is used (and listed, and counted against max_colors) without a hint showing it
+    name_mode = colors.hint_mode == "name"
+
+    def fits(spot, color):
+        return hint_size(color, spots[spot][2]) is not None
+
+    if adjacent_colors == "different":
+        index = {spot: i for i, spot in enumerate(keep)}
+        region_fits = (lambda region, color: fits(keep[region], color)) if name_mode else None
+        region_colors = colors.color_graph(len(keep), [(index[a], index[b]) for a, b in edges
+                                                       if a in index and b in index], fits=region_fits)
+    else:
+        region_colors = [colors.pick((lambda color, spot=spot: fits(spot, color)) if name_mode else None)
+                         for spot in keep]
+
+    for spot, color in zip(keep, region_colors):
+        if color is None:
+            continue
+        x, y, radius = spots[spot]
+        txt_hint = colors.hint(color)
+        size = hint_size(txt_hint, radius)
+        if size:
+            scene.add_label(x, y, txt_hint, size, 1.0, zorder=12)
+
+def generate_mandala_scene(color_hint_mode="none", color_mode="advanced", mandala_style="random", mandala_max_radius=1.35,
+                           seed=None, rng=None, hint_placement="shape", max_colors=None, adjacent_colors="random"):
+    """
+    Geometry stage: build the Scene of one mandala without drawing it. Returns (scene, legend).
+    seed/rng: the same seed (or Generator state) always builds the same scene.
+    hint_placement: "shape" lets each draw function place the hints of its shapes, "regions" labels every
+    closed region of the finished drawing once (slower, but no hint lands on a line or twice in one region).
+    max_colors: at most this many distinct colors on the page (a shorter legend).
+    adjacent_colors: "different" gives neighboring regions different colors (with hint_placement "regions").
+    """
+    started = time.perf_counter()
+    rng = get_rng(rng, seed)
     if color_mode == "basic":
         color_list = COLOR_NAMES_BASIC
     else:
         color_list = COLOR_NAMES_ADVANCED
 
-    fig, ax = plt.subplots(figsize=(7.7, 10.2), dpi=150)
-    ax.set_aspect('equal')
-    ax.axis('off')
+    scene = Scene()
     color_map = {}  # color name -> number
+    colors = ColorAssigner(color_list, color_hint_mode, rng, color_map, max_colors=max_colors)
+    tries = None  # placement attempts, random style only
+    # With region hints the draw functions only draw outlines; the hints are placed on the finished drawing
+    shape_hint_mode = "none" if hint_placement == "regions" else color_hint_mode
 
     if mandala_style == "geometric":
         center = (0, 0)
         r_max = mandala_max_radius
-        lw = np.random.uniform(1.7, 2.2)
+        lw = rng.uniform(1.7, 2.2)
         draw_geometric_mandala(
-            ax, center, r_max, lw,
-            color_list=color_list if color_hint_mode != "none" else None,
-            color_hint_mode=color_hint_mode, color_map=color_map
+            scene, center, r_max, lw,
+            color_list=color_list if shape_hint_mode != "none" else None,
+            color_hint_mode=shape_hint_mode, color_map=color_map, colors=colors, rng=rng
         )
     elif mandala_style == "easy_mandala":
         center = (0, 0)
         r_max = mandala_max_radius
-        lw = np.random.uniform(1.6, 2.1)
+        lw = rng.uniform(1.6, 2.1)
         # randomized parameters for variety
-        n_sectors = np.random.choice([6, 8, 9, 10])
+        n_sectors = pick(rng, [6, 8, 9, 10])
         n_star_points = n_sectors
-        n_petals = np.random.choice([12, 16, 20])
+        n_petals = pick(rng, [12, 16, 20])
         outer_circles = n_petals
         draw_easy_mandala(
-            ax, center, r_max, lw,
-            color_list=color_list if color_hint_mode != "none" else None,
-            color_hint_mode=color_hint_mode, color_map=color_map,
-            n_sectors=n_sectors, n_star_points=n_star_points, n_petals=n_petals, outer_circles=outer_circles
+            scene, center, r_max, lw,
+            color_list=color_list if shape_hint_mode != "none" else None,
+            color_hint_mode=shape_hint_mode, color_map=color_map, colors=colors,
+            n_sectors=n_sectors, n_star_points=n_star_points, n_petals=n_petals, outer_circles=outer_circles,
+            rng=rng
         )
     else:
         min_elements = 14
         max_elements = 22
-        n_elements = np.random.randint(min_elements, max_elements)
-        centers = []
-        radii = []
-
-        tries = 0
-        max_tries = 4000
-        min_overlap = 0.33
-        r_min = 0.34
-        r_max = 0.68
-
-        def random_center(r):
-            x = np.random.uniform(-0.97 + r, 0.97 - r)
-            y = np.random.uniform(-1.35 + r, 1.35 - r)
-            return (x, y)
-
-        while len(centers) < n_elements and tries < max_tries:
-            if tries > max_tries // 2 and min_overlap < 0.48:
-                min_overlap += 0.01
-                r_max -= 0.01
-            tries += 1
-            r = np.random.uniform(r_min, r_max)
-            new_center = random_center(r)
-            if flower_can_fit(new_center, r, centers, radii, min_overlap=min_overlap):
-                centers.append(new_center)
-                radii.append(r)
-
-        while len(centers) < min_elements and tries < max_tries*2:
-            tries += 1
-            r = np.random.uniform(0.28, 0.38)
-            new_center = random_center(r)
-            if flower_can_fit(new_center, r, centers, radii, min_overlap=min_overlap*0.8):
-                centers.append(new_center)
-                radii.append(r)
+        n_elements = rng.integers(min_elements, max_elements)
+        centers, radii, tries = random_layout(n_elements, min_elements, rng=rng)
 
         shape_functions = [draw_flower, draw_spiral, draw_leaf, draw_ray_mandala]
         for i, center in enumerate(centers):
             r = radii[i]
-            lw = np.random.uniform(1.4, 2.1)
-            shape_fn = np.random.choice(shape_functions)
+            lw = rng.uniform(1.4, 2.1)
+            shape_fn = pick(rng, shape_functions)
             shape_fn(
-                ax, center, r, lw,
-                color_list=color_list if color_hint_mode != "none" else None,
-                color_hint_mode=color_hint_mode, color_map=color_map
+                scene, center, r, lw,
+                color_list=color_list if shape_hint_mode != "none" else None,
+                color_hint_mode=shape_hint_mode, color_map=color_map, colors=colors, rng=rng
             )
 
-    plt.tight_layout(pad=0)
-    fig.savefig(output_path, transparent=True, bbox_inches='tight', pad_inches=0)
-    plt.close(fig)
+    if shape_hint_mode != color_hint_mode:
+        add_region_hints(scene, colors, adjacent_colors)
 
     # If number mode, return the legend mapping (sorted by number)
-    if color_hint_mode == "number" and len(color_map) > 0:
-        legend = sorted([(num, color) for color, num in color_map.items()], key=lambda x: x[0])
-        return legend
-    else:
-        return None
\ No newline at end of file
+    legend = colors.legend()
+    emit("scene", ms=round((time.perf_counter() - started) * 1000, 2), seed=seed, mandala_style=mandala_style,
+         outlines=len(scene.circle_centers) + len(scene.polygons) + len(scene.lines), labels=len(scene.labels),
+         tries=tries)
+    return scene, legend
+
+def render_scene(scene, paths, renderer=None, raster_mode="rgba", raster_dpi=None, raster_strip_height=None):
+    """
+    Rendering stage: ".npz" stores the scene itself (drawn later by the native PDF writer),
+    ".svg" is streamed by the SVG writer, any other extension is drawn by the matplotlib renderer.
+    raster_mode/raster_dpi: pixel format and resolution of ".png" files (see mpl_renderer.RASTER_MODES).
+    raster_strip_height: rasterize ".png" files in strips of this many pixels, for poster-size dpi.
+    """
+    mpl_paths = []
+    for path in paths:
+        extension = os.path.splitext(path)[1].lower()
+        if extension == ".npz":
+            scene.save(path)
+        elif extension == ".svg":
+            from svg_tools import save_scene_svg
+            save_scene_svg(scene, path)
+        else:
+            mpl_paths.append(path)
+    if mpl_paths:
+        # Imported here, so building and storing scenes never loads matplotlib
+        from mpl_renderer import render_scene as mpl_render_scene
+        mpl_render_scene(scene, mpl_paths, renderer=renderer, raster_mode=raster_mode, dpi=raster_dpi,
+                         strip_height=raster_strip_height)
+
+def generate_mandala_image(output_path, color_hint_mode="none", color_mode="advanced", mandala_style="random", mandala_max_radius=1.35,
+                           export_paths=None, seed=None, rng=None, renderer=None, hint_placement="shape",
+                           max_colors=None, adjacent_colors="random", raster_mode="rgba", raster_dpi=None,
+                           raster_strip_height=None):
+    # The file format follows the extension: ".png" is rasterized at the figure dpi,
+    # ".pdf"/".svg" keep the mandala as vector paths with the original stroke widths
+    # (".svg" is streamed by svg_tools, without matplotlib), ".npz" saves the scene for the native PDF writer.
+    # export_paths: optional extra files (e.g. an SVG copy) saved from the same drawing.
+    # seed/rng: the same seed (or Generator state) always draws the same mandala.
+    # renderer: mpl_renderer.MandalaRenderer to draw into (defaults to the one shared by this process).
+    # hint_placement, max_colors, adjacent_colors: see generate_mandala_scene.
+    # raster_mode/raster_dpi: ".png" as "rgba", "gray" or 1-bit "bilevel" pixels, at raster_dpi (None: default).
+    # raster_strip_height: render the ".png" strip by strip (bounded memory at any dpi), see render_scene.
+    scene, legend = generate_mandala_scene(color_hint_mode, color_mode, mandala_style, mandala_max_radius,
+                                           seed=seed, rng=rng, hint_placement=hint_placement,
+                                           max_colors=max_colors, adjacent_colors=adjacent_colors)
+    render_scene(scene, [output_path] + list(export_paths or []), renderer=renderer, raster_mode=raster_mode,
+                 raster_dpi=raster_dpi, raster_strip_height=raster_strip_height)
+    return legend
+
+# Formats a page can be produced in: the mandala alone as PNG/SVG/PDF, or "page", the finished A4 PDF page
+# with its legend (drawn from the scene by the native PDF writer)
+PAGE_FORMATS = ["png", "svg", "pdf", "page"]
+
+def render_scene_bytes(scene, formats, legend=None, seed=None, renderer=None, raster_mode="rgba", raster_dpi=None,
+                       raster_strip_height=None):
+    """
+    Render one scene in memory: returns {format: bytes} for the requested PAGE_FORMATS.
+    """
+    unknown = [f for f in formats if f not in PAGE_FORMATS]
+    if unknown:
+        raise ValueError(f"Unknown page format(s): {', '.join(unknown)}")
+    files = {}
+    mpl_formats = [f for f in formats if f in ("png", "pdf")]
+    if mpl_formats:
+        from mpl_renderer import render_scene_bytes as mpl_render_scene_bytes
+        files.update(mpl_render_scene_bytes(scene, mpl_formats, renderer=renderer, raster_mode=raster_mode,
+                                            dpi=raster_dpi, strip_height=raster_strip_height))
+    if "svg" in formats:
+        from svg_tools import write_scene_svg
+        buffer = io.StringIO()
+        write_scene_svg(scene, buffer)
+        files["svg"] = buffer.getvalue().encode("utf-8")
+    if "page" in formats:
+        from pdf_tools import pdf_book_bytes
+        files["page"] = pdf_book_bytes([(scene, legend)], seeds=[seed])
+    return files
+
+def mandala_page(seed, formats=("page",), color_hint_mode="none", color_mode="advanced", mandala_style="random",
+                 mandala_max_radius=1.35, renderer=None, hint_placement="shape", max_colors=None,
+                 adjacent_colors="random", raster_mode="rgba", raster_dpi=None, raster_strip_height=None):
+    """
+    One page as a dict: its seed, legend, style parameters and one bytes entry per requested format.
+    """
+    scene, legend = generate_mandala_scene(color_hint_mode, color_mode, mandala_style, mandala_max_radius, seed=seed,
+                                           hint_placement=hint_placement, max_colors=max_colors,
+                                           adjacent_colors=adjacent_colors)
+    page = {
+        "seed": seed,
+        "legend": legend,
+        "mandala_style": mandala_style,
+        "mandala_max_radius": mandala_max_radius,
+        "color_mode": color_mode,
+        "color_hint_mode": color_hint_mode,
+        "hint_placement": hint_placement,
+        "max_colors": max_colors,
+        "adjacent_colors": adjacent_colors,
+    }
+    page.update(render_scene_bytes(scene, formats, legend=legend, seed=seed, renderer=renderer,
+                                   raster_mode=raster_mode, raster_dpi=raster_dpi,
+                                   raster_strip_height=raster_strip_height))
+    return page
+
+def iter_mandala_pages(count=None, seed=None, formats=("page",), start=0, **options):
+    """
+    Yield pages lazily, one mandala_page() dict at a time (plus "index" and "batch_seed"), without writing files.
+    count=None keeps going forever; page i of a batch seed is always the same page, so start resumes a batch.
+    options: color_hint_mode, color_mode, mandala_style, mandala_max_radius, hint_placement, max_colors,
+    adjacent_colors, raster_mode, raster_dpi, raster_strip_height, renderer.
+
+        for page in iter_mandala_pages(10, seed=42, formats=("png", "page"), mandala_style="geometric"):
+            archive.writestr(f"page{page['index']}.pdf", page["page"])
+    """
+    if seed is None:
+        seed = new_batch_seed()
+    indexes = itertools.count(start) if count is None else range(start, start + count)
+    for index in indexes:
+        page = mandala_page(page_seeds(seed, 1, index)[0], formats, **options)
+        page["index"] = index
+        page["batch_seed"] = seed
+        yield page
@@ -0,0 +1,109 @@
+# manifest.py (append-only journal of batch runs: page seeds, parameters, status and output names)
+import os
+import json
+import uuid
+
+MANIFEST_FILE = "manifest.jsonl"
+
+class Manifest:
+    """
+    One JSON record per line in <output_dir>/manifest.jsonl:
+      {"type": "next", "prefix": ..., "number": ...}       next free output number for a file prefix
+      {"type": "batch", "id": ..., "seed": ..., "params": ..., "pages": [[seed, output], ...]}
+      {"type": "page", "batch": ..., "index": ..., "status": "done" | "failed"}
+      {"type": "end", "batch": ...}
+    Records are only appended, so a run killed at any point leaves a readable journal behind.
+    """
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, MANIFEST_FILE)
+        self.next_numbers = {}
+        self.batches = {}
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A line cut short by a crash: everything before it is still valid
+                    continue
+                kind = record.get("type")
+                if kind == "next":
+                    self.next_numbers[record["prefix"]] = record["number"]
+                elif kind == "batch":
+                    record["done"] = set()
+                    record["ended"] = False
+                    self.batches[record["id"]] = record
+                elif kind == "page" and record["batch"] in self.batches:
+                    done = self.batches[record["batch"]]["done"]
+                    if record["status"] == "done":
+                        done.add(record["index"])
+                    else:
+                        done.discard(record["index"])
+                elif kind == "end" and record["batch"] in self.batches:
+                    self.batches[record["batch"]]["ended"] = True
+
+    def append(self, record):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def allocate(self, count, prefix="output", used_numbers=None):
+        """
+        Reserve count new "<prefix>N.pdf" paths. The output folder is scanned only the first time a prefix is
+        seen (used_numbers(output_dir, prefix) -> set of numbers); after that the journal knows the next number.
+        """
+        number = self.next_numbers.get(prefix)
+        if number is None:
+            used = used_numbers(self.output_dir, prefix) if used_numbers else set()
+            number = max(used, default=0) + 1
+        paths = []
+        while len(paths) < count:
+            path = os.path.join(self.output_dir, f"{prefix}{number}.pdf")
+            # Files copied in by hand since the last run are still never overwritten
+            if not os.path.exists(path):
+                paths.append(path)
+            number += 1
+        self.next_numbers[prefix] = number
+        self.append({"type": "next", "prefix": prefix, "number": number})
+        return paths
+
+    def start_batch(self, seed, params, page_seeds, outputs):
+        batch = {"type": "batch", "id": uuid.uuid4().hex, "seed": seed, "params": params,
+                 "pages": [[page_seed, output] for page_seed, output in zip(page_seeds, outputs)]}
+        self.append(batch)
+        batch["done"] = set()
+        batch["ended"] = False
+        self.batches[batch["id"]] = batch
+        return batch
+
+    def unfinished_batch(self, params, seed=None):
+        """
+        The most recent batch with these parameters that never ended (and the same seed, if one is given).
+        """
+        for batch in reversed(list(self.batches.values())):
+            if not batch["ended"] and batch["params"] == params and (seed is None or batch["seed"] == seed):
+                return batch
+        return None
+
+    def pending_pages(self, batch):
+        # Pages marked done whose PDF has disappeared since are rendered again
+        return [i for i, (_, output) in enumerate(batch["pages"])
+                if i not in batch["done"] or not os.path.exists(output)]
+
+    def record_page(self, batch, index, success):
+        self.append({"type": "page", "batch": batch["id"], "index": index, "status": "done" if success else "failed"})
+        # Same bookkeeping as load(): a page that failed on a retry is no longer done
+        if success:
+            batch["done"].add(index)
+        else:
+            batch["done"].discard(index)
+
+    def end_batch(self, batch):
+        self.append({"type": "end", "batch": batch["id"]})
+        batch["ended"] = True
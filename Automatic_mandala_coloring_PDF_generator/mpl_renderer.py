@@ -0,0 +1,240 @@
+# mpl_renderer.py (matplotlib renderer for mandala scenes: PNG raster, PDF/SVG vector files)
+import io
+import os
+import sys
+import matplotlib
+# Never start a GUI backend from a worker or a cron job (unless the caller already set up pyplot)
+if "matplotlib.pyplot" not in sys.modules:
+    matplotlib.use("Agg")
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.patches import Circle
+from matplotlib.collections import PatchCollection, LineCollection, PolyCollection, PathCollection
+from matplotlib.font_manager import FontProperties
+from matplotlib.textpath import TextPath
+from matplotlib.transforms import Affine2D
+from matplotlib.path import Path
+import numpy as np
+
+from scene import FIGURE_SIZE
+from telemetry import timed
+
+# Label outlines are cached at this size (points) and scaled per label
+LABEL_REFERENCE_SIZE = 10.0
+# PNG pixel formats: transparent RGBA (as saved by matplotlib), 8-bit grayscale, or 1-bit black and white
+RASTER_MODES = ["rgba", "gray", "bilevel"]
+# Default PNG resolution; 1-bit lines need more pixels than anti-aliased ones to look as smooth
+RASTER_DPI = 150
+BILEVEL_DPI = 300
+# Rows per strip of save_scene_strips(): "gray" and "bilevel" PNGs are always rendered this way
+STRIP_HEIGHT = 512
+
+class MandalaRenderer:
+    """
+    One Agg figure and canvas, cleared and reused for every page (no pyplot figure manager involved).
+    Keep one per process: it is not thread-safe.
+    """
+    def __init__(self, figsize=FIGURE_SIZE, dpi=RASTER_DPI):
+        self.fig = Figure(figsize=figsize, dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.fig)
+
+    def new_page(self):
+        self.fig.clear()
+        axes = self.fig.add_subplot()
+        axes.set_aspect('equal')
+        axes.axis('off')
+        return axes
+
+    def save(self, paths, dpi=None):
+        with timed("savefig", formats=[os.path.splitext(path)[1][1:].lower() for path in paths]):
+            self.fig.tight_layout(pad=0)
+            for path in paths:
+                self.write(path, os.path.splitext(path)[1][1:].lower(), dpi)
+        # Drop the artists right away instead of keeping the last page alive until the next one
+        self.fig.clear()
+
+    def save_bytes(self, formats, dpi=None):
+        """
+        Same as save(), into memory: returns {format: bytes}.
+        """
+        files = {}
+        with timed("savefig", formats=list(formats)):
+            self.fig.tight_layout(pad=0)
+            for image_format in formats:
+                buffer = io.BytesIO()
+                self.write(buffer, image_format, dpi)
+                files[image_format] = buffer.getvalue()
+        self.fig.clear()
+        return files
+
+    def write(self, target, image_format, dpi=None):
+        # No timestamps in vector files and a fixed salt for SVG clip-path ids,
+        # so the same seed gives byte-identical output
+        metadata = {'pdf': {'CreationDate': None}, 'svg': {'Date': None}}.get(image_format)
+        with matplotlib.rc_context({'svg.hashsalt': 'mandala'}):
+            self.fig.savefig(target, format=image_format, transparent=True, bbox_inches='tight', pad_inches=0,
+                             metadata=metadata, dpi=dpi or 'figure')
+
+_renderer = None
+
+def get_renderer():
+    """
+    The renderer of the current process, created on first use.
+    """
+    global _renderer
+    if _renderer is None:
+        _renderer = MandalaRenderer()
+    return _renderer
+
+_label_glyphs = {}
+
+def label_glyphs(text):
+    """
+    Bold outline of a label at LABEL_REFERENCE_SIZE points, centered on its bounding box, as (vertices, codes).
+    Cached per string: a page only ever uses a few dozen distinct numbers or color names.
+    """
+    glyphs = _label_glyphs.get(text)
+    if glyphs is None:
+        path = TextPath((0, 0), text, size=LABEL_REFERENCE_SIZE, prop=FontProperties(weight='bold'))
+        center = path.get_extents().get_points().mean(axis=0) if len(path.vertices) else np.zeros(2)
+        glyphs = _label_glyphs[text] = (path.vertices - center, path.codes)
+    return glyphs
+
+def draw_labels(axes, labels):
+    """
+    All labels as two path collections per (zorder, clip): white halos, then black glyphs on top,
+    instead of one Text artist with a stroke path effect per label.
+    """
+    groups = {}
+    for x, y, text, fontsize, halo, rotation, zorder, clip in labels:
+        vertices, codes = label_glyphs(text)
+        vertices = vertices * (fontsize / LABEL_REFERENCE_SIZE)
+        if rotation:
+            c, s = np.cos(np.radians(rotation)), np.sin(np.radians(rotation))
+            vertices = vertices @ np.array([[c, s], [-s, c]])
+        paths, offsets, halos = groups.setdefault((zorder, clip), ([], [], []))
+        paths.append(Path(vertices, codes))
+        offsets.append((x, y))
+        halos.append(halo)
+
+    # Glyphs are sized in points (scaled with the output dpi) and placed at data coordinates
+    points = Affine2D().scale(1 / 72) + axes.figure.dpi_scale_trans
+    for (zorder, clip), (paths, offsets, halos) in groups.items():
+        halo_collection = PathCollection(paths, offsets=offsets, offset_transform=axes.transData, transform=points,
+                                         facecolors='white', edgecolors='white', linewidths=halos,
+                                         joinstyle='round', zorder=zorder)
+        glyph_collection = PathCollection(paths, offsets=offsets, offset_transform=axes.transData, transform=points,
+                                          facecolors='black', edgecolors='none', zorder=zorder)
+        for collection in (halo_collection, glyph_collection):
+            collection.set_clip_on(clip)
+            # Labels never widen the view (text artists did not either)
+            axes.add_collection(collection, autolim=False)
+
+def draw_scene(axes, scene):
+    # One collection per kind of outline instead of one artist per shape
+    if scene.circle_centers:
+        circles = [Circle(c, radius) for c, radius in zip(scene.circle_centers, scene.circle_radii)]
+        axes.add_collection(PatchCollection(circles, facecolor='none', edgecolor='black',
+                                            linewidths=scene.circle_widths))
+    if scene.polygons:
+        axes.add_collection(PolyCollection(scene.polygons, closed=True, facecolor='none', edgecolor='black',
+                                           linewidths=scene.polygon_widths, joinstyle='miter'))
+    if scene.lines:
+        # Same cap/join style as the Line2D artists ax.plot used to create
+        axes.add_collection(LineCollection(scene.lines, colors='black', linewidths=scene.line_widths,
+                                           capstyle='projecting', joinstyle='round'))
+    if scene.xlim and scene.ylim:
+        axes.set_xlim(*scene.xlim)
+        axes.set_ylim(*scene.ylim)
+    if scene.labels:
+        draw_labels(axes, scene.labels)
+    axes.autoscale_view()
+
+def save_scene_strips(scene, target, raster_mode="rgba", dpi=None, strip_height=STRIP_HEIGHT):
+    """
+    Rasterize the scene's view box to a PNG (path or binary file object) at any dpi, one horizontal strip of
+    strip_height pixels at a time: the figure only covers one strip and every strip goes straight into the PNG
+    stream, so memory use depends on the page width and strip height, not on the dpi squared.
+    "rgba" is written as RGB on white: an alpha channel would have to be decoded and split off again to embed
+    the image in a PDF, while opaque PNG data goes into the page as it is (pdf_tools.add_image_xobject).
+    """
+    from png_tools import PngWriter
+
+    if raster_mode not in RASTER_MODES:
+        raise ValueError(f"Unknown raster mode: {raster_mode}")
+    dpi = dpi or (BILEVEL_DPI if raster_mode == "bilevel" else RASTER_DPI)
+    # Pixels per data unit, with the page layout of the other renderers
+    scale = scene.point_scale() / 72 * dpi
+    (x0, x1), (y0, y1) = scene.view_limits()
+    width, height = max(int(round((x1 - x0) * scale)), 1), max(int(round((y1 - y0) * scale)), 1)
+    strip_height = min(strip_height, height)
+
+    # Half a pixel extra, so rounding never leaves the canvas a pixel short
+    fig = Figure(figsize=((width + 0.5) / dpi, (strip_height + 0.5) / dpi), dpi=dpi)
+    canvas = FigureCanvasAgg(fig)
+    axes = fig.add_axes((0, 0, 1, 1))
+    axes.axis('off')
+    draw_scene(axes, scene)
+    # Agg clips unfilled paths to the canvas, which opens the closed outlines crossing a strip edge and drops
+    # their closing miter joins; with a transparent fill they are drawn whole
+    for collection in axes.collections:
+        if isinstance(collection, (PolyCollection, PatchCollection)):
+            collection.set_facecolor((1, 1, 1, 0))
+    axes.set_xlim(x0, x0 + (width + 0.5) / scale)
+
+    f = open(target, "wb") if isinstance(target, str) else target
+    try:
+        with timed("savefig", formats=["png"], strips=-(-height // strip_height), dpi=dpi):
+            writer = PngWriter(f, width, height, color="rgb" if raster_mode == "rgba" else "gray",
+                               bits=1 if raster_mode == "bilevel" else 8, dpi=dpi)
+            for top in range(0, height, strip_height):
+                # Agg puts row 0 at the canvas height, half a pixel below the top of the figure
+                axes.set_ylim(y1 - (top + strip_height) / scale, y1 - (top - 0.5) / scale)
+                canvas.draw()
+                pixels = np.asarray(canvas.buffer_rgba())[:min(strip_height, height - top), :width]
+                if raster_mode == "rgba":
+                    writer.write_rows(pixels[:, :, :3])
+                elif raster_mode == "gray":
+                    writer.write_rows(pixels[:, :, 0])
+                else:
+                    writer.write_rows(pixels[:, :, 0] >= 128)
+            writer.close()
+    finally:
+        if f is not target:
+            f.close()
+
+def render_scene(scene, paths, renderer=None, raster_mode="rgba", dpi=None, strip_height=None):
+    """
+    Draw the scene once and save it to every path (format from the extension).
+    raster_mode/dpi: pixel format (RASTER_MODES) and resolution of PNG files.
+    strip_height: render PNG files in strips of this many pixels (save_scene_strips), for very high dpi;
+    "gray" and "bilevel" PNGs always are (STRIP_HEIGHT rows by default), "rgba" ones only when it is set.
+    """
+    if raster_mode != "rgba":
+        strip_height = strip_height or STRIP_HEIGHT
+    if strip_height:
+        for path in paths:
+            if path.lower().endswith(".png"):
+                save_scene_strips(scene, path, raster_mode, dpi, strip_height)
+        paths = [path for path in paths if not path.lower().endswith(".png")]
+        if not paths:
+            return
+    renderer = renderer or get_renderer()
+    draw_scene(renderer.new_page(), scene)
+    renderer.save(paths, dpi)
+
+def render_scene_bytes(scene, formats, renderer=None, raster_mode="rgba", dpi=None, strip_height=None):
+    files = {}
+    if raster_mode != "rgba":
+        strip_height = strip_height or STRIP_HEIGHT
+    if strip_height and "png" in formats:
+        buffer = io.BytesIO()
+        save_scene_strips(scene, buffer, raster_mode, dpi, strip_height)
+        files["png"] = buffer.getvalue()
+        formats = [f for f in formats if f != "png"]
+        if not formats:
+            return files
+    renderer = renderer or get_renderer()
+    draw_scene(renderer.new_page(), scene)
+    files.update(renderer.save_bytes(formats, dpi))
+    return files
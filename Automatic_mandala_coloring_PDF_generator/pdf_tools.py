@@ -0,0 +1,401 @@
+# pdf_tools.py (native PDF writer: same A4 layout as latex_tools, without LaTeX)
+import os
+import re
+import math
+import zlib
+
+from telemetry import log
+
+CM = 72 / 2.54
+PAGE_WIDTH = 21.0 * CM
+PAGE_HEIGHT = 29.7 * CM
+MARGIN = 1.5 * CM
+IMAGE_MAX_WIDTH = 18 * CM
+IMAGE_MAX_HEIGHT = 25 * CM
+
+LEGEND_MAX_COL = 5
+LEGEND_FONT_SIZE = 10
+LEGEND_ROW_HEIGHT = 13.8
+LEGEND_PADDING = 6
+LEGEND_GAP = 20
+LEGEND_RULE_WIDTH = 0.4
+
+# Bezier handle length for a quarter circle
+CIRCLE_KAPPA = 0.5523
+# Baseline offset (in em) that centers a bold line of digits/letters vertically on its anchor
+LABEL_BASELINE_SHIFT = 0.36
+
+# Advance widths (1/1000 em) of the standard Helvetica fonts for ASCII 32..126, from the Adobe AFM files
+HELVETICA_WIDTHS = [
+    278, 278, 355, 556, 556, 889, 667, 222, 333, 333, 389, 584, 278, 333, 278, 278, 556, 556, 556, 556,
+    556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556, 1015, 667, 667, 722, 722, 667, 611, 778,
+    722, 278, 500, 667, 556, 833, 722, 778, 667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278,
+    278, 278, 469, 556, 222, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584
+]
+HELVETICA_BOLD_WIDTHS = [
+    278, 333, 474, 556, 556, 889, 722, 278, 333, 333, 389, 584, 278, 333, 278, 278, 556, 556, 556, 556,
+    556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611, 975, 722, 722, 722, 722, 667, 611, 778,
+    722, 278, 556, 722, 611, 833, 722, 778, 667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333,
+    278, 333, 584, 556, 278, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584
+]
+
+def text_width(text, font_size, bold=False):
+    widths = HELVETICA_BOLD_WIDTHS if bold else HELVETICA_WIDTHS
+    total = 0
+    for ch in text:
+        code = ord(ch)
+        total += widths[code - 32] if 32 <= code <= 126 else 556
+    return total * font_size / 1000
+
+def pdf_string(text):
+    escaped = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return "(" + escaped.encode("latin-1", "replace").decode("latin-1") + ")"
+
+def fmt(value):
+    return f"{value:.2f}".rstrip("0").rstrip(".")
+
+class PdfDocument:
+    """
+    Minimal PDF object writer: objects are numbered in insertion order and written with a classic xref table.
+    """
+    def __init__(self):
+        self.objects = []
+
+    def reserve(self):
+        self.objects.append(None)
+        return len(self.objects)
+
+    def set(self, num, body):
+        self.objects[num - 1] = body if isinstance(body, bytes) else body.encode("latin-1")
+
+    def add(self, body):
+        num = self.reserve()
+        self.set(num, body)
+        return num
+
+    def add_stream(self, entries, data, compress=True):
+        if compress:
+            data = zlib.compress(data)
+            entries += " /Filter /FlateDecode"
+        return self.add(f"<< {entries} /Length {len(data)} >>\nstream\n".encode("latin-1") + data + b"\nendstream")
+
+    def write(self, path, root, info=None):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes(root, info))
+
+    def to_bytes(self, root, info=None):
+        out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for num, body in enumerate(self.objects, start=1):
+            offsets.append(len(out))
+            out += f"{num} 0 obj\n".encode("latin-1") + body + b"\nendobj\n"
+        xref = len(out)
+        out += f"xref\n0 {len(self.objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+        for offset in offsets:
+            out += f"{offset:010d} 00000 n \n".encode("latin-1")
+        trailer = f"/Size {len(self.objects) + 1} /Root {root} 0 R"
+        if info:
+            trailer += f" /Info {info} 0 R"
+        out += f"trailer\n<< {trailer} >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+        return bytes(out)
+
+def add_image_xobject(doc, image_path):
+    """
+    Embed a raster image (composited on white, like the printed page) as a Flate-compressed XObject.
+    Grayscale and 1-bit images (raster_mode "gray"/"bilevel") stay DeviceGray with 8 or 1 bits per pixel.
+    Gray and RGB PNGs without transparency (like every strip render) are copied in still compressed, whatever
+    their size; transparent ones are decoded and composited in memory.
+    """
+    from PIL import Image
+    from png_tools import png_image_data
+
+    png = png_image_data(image_path) if image_path.lower().endswith(".png") else None
+    if png is not None:
+        width, height, bits, channels, data = png
+        color_space = "DeviceGray" if channels == 1 else "DeviceRGB"
+        num = doc.add_stream(f"/Type /XObject /Subtype /Image /Width {width} /Height {height} "
+                             f"/ColorSpace /{color_space} /BitsPerComponent {bits} /Filter /FlateDecode "
+                             f"/DecodeParms << /Predictor 15 /Colors {channels} /BitsPerComponent {bits} "
+                             f"/Columns {width} >>", data, compress=False)
+        return num, width, height
+
+    with Image.open(image_path) as im:
+        if im.mode in ("RGBA", "LA", "P"):
+            im = im.convert("RGBA")
+            page = Image.new("RGB", im.size, "white")
+            page.paste(im, mask=im.getchannel("A"))
+        elif im.mode in ("1", "L"):
+            page = im.copy()
+        else:
+            page = im.convert("RGB")
+        width, height = page.size
+        # Mode "1" packs 8 pixels per byte, rows padded to whole bytes, 1 = white: exactly PDF's 1-bit DeviceGray
+        data = page.tobytes()
+    color_space, bits = {"1": ("DeviceGray", 1), "L": ("DeviceGray", 8)}.get(page.mode, ("DeviceRGB", 8))
+    num = doc.add_stream(f"/Type /XObject /Subtype /Image /Width {width} /Height {height} "
+                         f"/ColorSpace /{color_space} /BitsPerComponent {bits}", data)
+    return num, width, height
+
+REF_RE = re.compile(rb"(\d+) 0 R")
+
+def read_pdf_objects(pdf_path):
+    """
+    Read every object of a PDF with a classic xref table (like the ones matplotlib writes) as raw bytes.
+    """
+    with open(pdf_path, "rb") as f:
+        data = f.read()
+    xref = int(re.findall(rb"startxref\s+(\d+)", data)[-1])
+    lines = iter(data[xref:].split(b"trailer")[0].split(b"\n")[1:])
+    offsets = {}
+    for line in lines:
+        parts = line.split()
+        if len(parts) == 2:
+            first, count = int(parts[0]), int(parts[1])
+            for num in range(first, first + count):
+                entry = next(lines).split()
+                if entry[2] == b"n":
+                    offsets[num] = int(entry[0])
+    objects = {}
+    for num, offset in offsets.items():
+        start = data.index(b"obj", offset) + 3
+        end = data.index(b"endobj", start)
+        objects[num] = data[start:end].strip()
+    trailer = data[data.rindex(b"trailer"):]
+    root = int(re.search(rb"/Root (\d+) 0 R", trailer).group(1))
+    return objects, root
+
+def split_stream(objects, body):
+    # Returns (dictionary bytes, stream data or None); /Length may be an indirect reference
+    if b"stream" not in body:
+        return body, None
+    head, _, rest = body.partition(b"stream")
+    rest = rest[2:] if rest.startswith(b"\r\n") else rest[1:]
+    length = re.search(rb"/Length (\d+)( 0 R)?", head)
+    size = int(objects[int(length.group(1))]) if length.group(2) else int(length.group(1))
+    head = head[:length.start()] + head[length.end():]
+    return head.strip(), rest[:size]
+
+def copy_pdf_object(doc, objects, num, copied):
+    """
+    Copy object num and everything it references into doc, renumbering the references.
+    """
+    if num in copied:
+        return copied[num]
+    new_num = doc.reserve()
+    copied[num] = new_num
+    head, stream = split_stream(objects, objects[num])
+    head = REF_RE.sub(lambda m: b"%d 0 R" % copy_pdf_object(doc, objects, int(m.group(1)), copied), head)
+    if stream is None:
+        doc.set(new_num, head)
+    else:
+        doc.set(new_num, head[:-2].rstrip() + b" /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    return new_num
+
+def add_pdf_form_xobject(doc, pdf_path):
+    """
+    Embed the first page of a vector PDF as a Form XObject mapped to the unit square, so it is placed like an image.
+    """
+    objects, root = read_pdf_objects(pdf_path)
+    pages = int(re.search(rb"/Pages (\d+) 0 R", objects[root]).group(1))
+    page = objects[int(re.search(rb"/Kids \[\s*(\d+) 0 R", objects[pages]).group(1))]
+    x0, y0, x1, y1 = [float(v) for v in re.search(rb"/MediaBox \[([^\]]*)\]", page).group(1).split()]
+    width, height = x1 - x0, y1 - y0
+
+    copied = {}
+    resources = copy_pdf_object(doc, objects, int(re.search(rb"/Resources (\d+) 0 R", page).group(1)), copied)
+    head, content = split_stream(objects, objects[int(re.search(rb"/Contents (\d+) 0 R", page).group(1))])
+    filters = re.search(rb"/Filter\s*(/\w+)", head)
+    entries = (f"/Type /XObject /Subtype /Form /BBox [{fmt(x0)} {fmt(y0)} {fmt(x1)} {fmt(y1)}] "
+               f"/Matrix [{1 / width:.8f} 0 0 {1 / height:.8f} {-x0 / width:.8f} {-y0 / height:.8f}] "
+               f"/Resources {resources} 0 R")
+    if filters:
+        entries += " /Filter " + filters.group(1).decode("latin-1")
+    num = doc.add_stream(entries, content, compress=False)
+    return num, width, height
+
+def scene_ops(scene, scale, x0, y0):
+    """
+    Content stream operators drawing a Scene in points: data (x, y) -> ((x - x0) * scale, (y - y0) * scale).
+    """
+    def pt(x, y):
+        return f"{fmt((x - x0) * scale)} {fmt((y - y0) * scale)}"
+
+    ops = ["0 G 0 j"]
+    width = None
+
+    def stroke_width(lw):
+        nonlocal width
+        if lw != width:
+            width = lw
+            ops.append(f"{fmt(lw)} w")
+
+    k = CIRCLE_KAPPA
+    for (cx, cy), radius, lw in zip(scene.circle_centers, scene.circle_radii, scene.circle_widths):
+        stroke_width(lw)
+        r, h = radius, radius * k
+        ops.append(f"{pt(cx + r, cy)} m "
+                   f"{pt(cx + r, cy + h)} {pt(cx + h, cy + r)} {pt(cx, cy + r)} c "
+                   f"{pt(cx - h, cy + r)} {pt(cx - r, cy + h)} {pt(cx - r, cy)} c "
+                   f"{pt(cx - r, cy - h)} {pt(cx - h, cy - r)} {pt(cx, cy - r)} c "
+                   f"{pt(cx + h, cy - r)} {pt(cx + r, cy - h)} {pt(cx + r, cy)} c S")
+    for verts, lw in zip(scene.polygons, scene.polygon_widths):
+        stroke_width(lw)
+        ops.append(" ".join([f"{pt(*verts[0])} m"] + [f"{pt(*p)} l" for p in verts[1:]]) + " h S")
+    # Open polylines keep the projecting caps and round joins of the matplotlib renderer
+    ops.append("2 J 1 j")
+    for verts, lw in zip(scene.lines, scene.line_widths):
+        stroke_width(lw)
+        ops.append(" ".join([f"{pt(*verts[0])} m"] + [f"{pt(*p)} l" for p in verts[1:]]) + " S")
+
+    # Hint labels: a white stroked copy (the halo) under the black fill, like the Stroke path effect
+    ops.append("0 J 1 j 1 1 1 RG 0 g BT")
+    for x, y, text, size, halo, rotation, _, _ in sorted(scene.labels, key=lambda label: label[6]):
+        angle = math.radians(rotation)
+        cos_a, sin_a = math.cos(angle), math.sin(angle)
+        dx, dy = -text_width(text, size, bold=True) / 2, -LABEL_BASELINE_SHIFT * size
+        tx = (x - x0) * scale + dx * cos_a - dy * sin_a
+        ty = (y - y0) * scale + dx * sin_a + dy * cos_a
+        matrix = f"{cos_a:.4f} {sin_a:.4f} {-sin_a:.4f} {cos_a:.4f} {fmt(tx)} {fmt(ty)} Tm"
+        # Tj advances the text position: the fill starts again from the label's own matrix
+        ops.append(f"/F2 {fmt(size)} Tf {matrix} {fmt(halo)} w 1 Tr {pdf_string(text)} Tj "
+                   f"{matrix} 0 Tr {pdf_string(text)} Tj")
+    ops.append("ET")
+    return ops
+
+def add_scene_xobject(doc, scene, fonts):
+    """
+    Draw a Scene straight into a Form XObject mapped to the unit square (no matplotlib involved).
+    """
+    scale = scene.point_scale()
+    (x0, x1), (y0, y1) = scene.view_limits()
+    width, height = (x1 - x0) * scale, (y1 - y0) * scale
+    content = "\n".join(scene_ops(scene, scale, x0, y0)).encode("latin-1")
+    entries = (f"/Type /XObject /Subtype /Form /BBox [0 0 {fmt(width)} {fmt(height)}] "
+               f"/Matrix [{1 / width:.8f} 0 0 {1 / height:.8f} 0 0] "
+               f"/Resources << /Font << /F2 {fonts[1]} 0 R >> >>")
+    return doc.add_stream(entries, content), width, height
+
+def add_mandala_xobject(doc, image_path, fonts):
+    # image_path may also be a Scene object still in memory
+    if not isinstance(image_path, str):
+        return add_scene_xobject(doc, image_path, fonts)
+    extension = os.path.splitext(image_path)[1].lower()
+    if extension == ".pdf":
+        return add_pdf_form_xobject(doc, image_path)
+    if extension == ".npz":
+        from scene import Scene
+        return add_scene_xobject(doc, Scene.load(image_path), fonts)
+    return add_image_xobject(doc, image_path)
+
+def legend_table_ops(legend, x, top):
+    """
+    Content stream operators for the legend grid: pairs of (No., Color Name) columns, max 5 pairs per row.
+    """
+    n_cols = LEGEND_MAX_COL * 2
+    header = ["No.", "Color Name"] * LEGEND_MAX_COL
+    rows = []
+    for i in range(0, len(legend), LEGEND_MAX_COL):
+        row = []
+        for cell in legend[i:i+LEGEND_MAX_COL]:
+            row.extend([str(cell[0]), cell[1]])
+        row.extend([""] * (n_cols - len(row)))
+        rows.append(row)
+
+    col_widths = []
+    for j in range(n_cols):
+        widest = max([text_width(header[j], LEGEND_FONT_SIZE, bold=True)] +
+                     [text_width(row[j], LEGEND_FONT_SIZE) for row in rows])
+        col_widths.append(widest + 2 * LEGEND_PADDING)
+    table_width = sum(col_widths)
+    table_height = (len(rows) + 1) * LEGEND_ROW_HEIGHT
+
+    ops = [f"{fmt(LEGEND_RULE_WIDTH)} w 0 G"]
+    for k in range(len(rows) + 2):
+        y = top - k * LEGEND_ROW_HEIGHT
+        ops.append(f"{fmt(x)} {fmt(y)} m {fmt(x + table_width)} {fmt(y)} l S")
+    col_x = x
+    for width in col_widths + [0]:
+        ops.append(f"{fmt(col_x)} {fmt(top)} m {fmt(col_x)} {fmt(top - table_height)} l S")
+        col_x += width
+
+    ops.append("0 g BT")
+    for k, cells in enumerate([header] + rows):
+        baseline = top - (k + 1) * LEGEND_ROW_HEIGHT + (LEGEND_ROW_HEIGHT - LEGEND_FONT_SIZE * 0.72) / 2
+        font = "/F2" if k == 0 else "/F1"
+        col_x = x
+        for j, text in enumerate(cells):
+            if text:
+                tx = col_x + (col_widths[j] - text_width(text, LEGEND_FONT_SIZE, bold=(k == 0))) / 2
+                ops.append(f"{font} {LEGEND_FONT_SIZE} Tf 1 0 0 1 {fmt(tx)} {fmt(baseline)} Tm {pdf_string(text)} Tj")
+            col_x += col_widths[j]
+    ops.append("ET")
+    return ops, table_height
+
+def legend_height(legend):
+    if not legend:
+        return 0
+    n_rows = -(-len(legend) // LEGEND_MAX_COL)
+    return LEGEND_GAP + (n_rows + 1) * LEGEND_ROW_HEIGHT
+
+def add_page(doc, pages_num, fonts, image_path, legend=None):
+    image_num, px_width, px_height = add_mandala_xobject(doc, image_path, fonts)
+
+    # keepaspectratio inside the 18x25 cm box, shrunk if the legend needs the room
+    max_height = min(IMAGE_MAX_HEIGHT, PAGE_HEIGHT - 2 * MARGIN - legend_height(legend))
+    scale = min(IMAGE_MAX_WIDTH / px_width, max_height / px_height)
+    width, height = px_width * scale, px_height * scale
+    x = (PAGE_WIDTH - width) / 2
+    y = PAGE_HEIGHT - MARGIN - height
+    ops = [f"q {fmt(width)} 0 0 {fmt(height)} {fmt(x)} {fmt(y)} cm /Im1 Do Q"]
+
+    if legend:
+        table_ops, _ = legend_table_ops(legend, MARGIN, y - LEGEND_GAP)
+        ops.extend(table_ops)
+
+    content_num = doc.add_stream("", "\n".join(ops).encode("latin-1"))
+    return doc.add(f"<< /Type /Page /Parent {pages_num} 0 R /MediaBox [0 0 {fmt(PAGE_WIDTH)} {fmt(PAGE_HEIGHT)}] "
+                   f"/Resources << /Font << /F1 {fonts[0]} 0 R /F2 {fonts[1]} 0 R >> "
+                   f"/XObject << /Im1 {image_num} 0 R >> >> /Contents {content_num} 0 R >>")
+
+def pdf_book_bytes(pages, seeds=None):
+    """
+    One A4 page per (image_path or Scene, legend) tuple, returned as the bytes of the PDF file.
+    """
+    doc = PdfDocument()
+    catalog_num = doc.reserve()
+    pages_num = doc.reserve()
+    fonts = (
+        doc.add("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"),
+        doc.add("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>"),
+    )
+    kids = [add_page(doc, pages_num, fonts, image_path, legend) for image_path, legend in pages]
+    doc.set(catalog_num, f"<< /Type /Catalog /Pages {pages_num} 0 R >>")
+    doc.set(pages_num, f"<< /Type /Pages /Kids [{' '.join(f'{k} 0 R' for k in kids)}] /Count {len(kids)} >>")
+    info = "/Producer (Automatic mandala coloring PDF generator)"
+    seeds = [str(seed) for seed in (seeds or []) if seed is not None]
+    if seeds:
+        # Record the page seed(s), so a page can be regenerated instead of stored
+        info += f" /Subject (Mandala seed{'s' if len(seeds) > 1 else ''} {' '.join(seeds)})"
+    info_num = doc.add(f"<< {info} >>")
+    return doc.to_bytes(catalog_num, info_num)
+
+def create_pdf_book(pages, pdf_output_path, seeds=None):
+    """
+    Write one A4 page per (image_path, legend) tuple directly as PDF objects.
+    """
+    try:
+        data = pdf_book_bytes(pages, seeds)
+        with open(pdf_output_path, "wb") as f:
+            f.write(data)
+        return True
+    except Exception as e:
+        log("ERROR", f"PDF writer: {e}")
+        return False
+
+def create_pdf_file(image_path, pdf_output_path, legend=None, seed=None):
+    """
+    Format the mandala image on an A4 page with the legend table below it, like create_latex_file.
+    """
+    return create_pdf_book([(image_path, legend)], pdf_output_path, seeds=[seed])
@@ -0,0 +1,77 @@
+# png_tools.py (streaming PNG writer and reader of PNG data for the PDF writers, no image library needed)
+import struct
+import zlib
+import numpy as np
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# PNG color type codes, and the number of components of the ones a PDF image can take as they are
+COLOR_TYPES = {"gray": 0, "rgb": 2, "rgba": 6}
+CHANNELS = {0: 1, 2: 3}
+
+def chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+class PngWriter:
+    """
+    Write a PNG strip by strip: rows are filtered (type 0: none) and deflated as they come, and each strip's
+    compressed output goes out as its own IDAT chunk, so only one strip is ever held in memory.
+    bits: 8, or 1 for gray images (rows then are bools, True = white).
+    """
+    def __init__(self, f, width, height, color="gray", bits=8, dpi=None):
+        self.f = f
+        self.width = width
+        self.height = height
+        self.bits = bits
+        self.rows = 0
+        self.compressor = zlib.compressobj(6)
+        header = struct.pack(">IIBBBBB", width, height, bits, COLOR_TYPES[color], 0, 0, 0)
+        f.write(PNG_SIGNATURE + chunk(b"IHDR", header))
+        if dpi:
+            per_meter = int(round(dpi / 0.0254))
+            f.write(chunk(b"pHYs", struct.pack(">IIB", per_meter, per_meter, 1)))
+
+    def write_rows(self, rows):
+        """
+        rows: uint8 array (rows, width) or (rows, width, channels); bool (rows, width) for 1-bit images.
+        """
+        if self.bits == 1:
+            rows = np.packbits(rows, axis=1)
+        rows = rows.reshape(len(rows), -1)
+        # Filter type byte in front of every row
+        data = np.concatenate([np.zeros((len(rows), 1), dtype=np.uint8), rows], axis=1)
+        compressed = self.compressor.compress(data.tobytes())
+        if compressed:
+            self.f.write(chunk(b"IDAT", compressed))
+        self.rows += len(rows)
+
+    def close(self):
+        if self.rows != self.height:
+            raise ValueError(f"PNG has {self.rows} rows written, {self.height} declared")
+        self.f.write(chunk(b"IDAT", self.compressor.flush()) + chunk(b"IEND", b""))
+
+def png_image_data(path):
+    """
+    (width, height, bits, channels, data) of a non-interlaced gray or RGB PNG without palette or alpha, where
+    data is its zlib stream as is: with /DecodeParms << /Predictor 15 ... >> a PDF viewer decodes it directly,
+    so the pixels are never decompressed here. None for every other kind of PNG.
+    """
+    with open(path, "rb") as f:
+        if f.read(8) != PNG_SIGNATURE:
+            return None
+        data = []
+        while True:
+            length, kind = struct.unpack(">I4s", f.read(8))
+            body = f.read(length)
+            f.read(4)
+            if kind == b"IHDR":
+                width, height, bits, color_type, _, _, interlace = struct.unpack(">IIBBBBB", body)
+                if color_type not in CHANNELS or interlace or bits not in (1, 2, 4, 8):
+                    return None
+            elif kind == b"IDAT":
+                data.append(body)
+            elif kind == b"tRNS":
+                # Transparency: has to be composited on white first
+                return None
+            elif kind == b"IEND":
+                break
+    return width, height, bits, CHANNELS[color_type], b"".join(data)
@@ -0,0 +1,220 @@
+# regions.py (finds the colorable regions of a finished scene, their neighbors and where hints fit, NumPy only)
+import numpy as np
+
+# Raster size along the longer side of the view: about 1.4 pt per pixel on the page
+REGION_RESOLUTION = 400
+# Regions with fewer pixels than this are slivers between strokes, not places to color
+MIN_REGION_PIXELS = 12
+# Font size range of region hints, in points; regions too small for the minimum size get no hint
+HINT_MIN_SIZE = 5.0
+HINT_MAX_SIZE = 14.0
+
+def rasterize_outlines(scene, xlim, ylim, shape):
+    """
+    Boolean (rows, cols) raster of every stroke: outlines are sampled at sub-pixel steps in one vectorized pass
+    and widened by their stroke width, so shapes that touch on the page are closed on the raster as well.
+    """
+    rows, cols = shape
+    scale = (cols - 1) / (xlim[1] - xlim[0])
+    segments, widths = [], []
+    if scene.circle_centers:
+        centers = np.array(scene.circle_centers)
+        radii = np.array(scene.circle_radii)
+        # Enough vertices per circle for chords shorter than a pixel
+        n = int(np.clip(2 * np.pi * radii.max() * scale, 16, 4096))
+        t = np.linspace(0, 2 * np.pi, n + 1)
+        rings = centers[:, None, :] + radii[:, None, None] * np.stack([np.cos(t), np.sin(t)], axis=-1)
+        segments.append(np.stack([rings[:, :-1], rings[:, 1:]], axis=2).reshape(-1, 2, 2))
+        widths.append(np.repeat(scene.circle_widths, n))
+    for shapes, shape_widths, closed in ((scene.polygons, scene.polygon_widths, True),
+                                         (scene.lines, scene.line_widths, False)):
+        for points, lw in zip(shapes, shape_widths):
+            points = np.asarray(points, dtype=float).reshape(-1, 2)
+            ends = np.roll(points, -1, axis=0) if closed else points[1:]
+            starts = points if closed else points[:-1]
+            segments.append(np.stack([starts, ends], axis=1))
+            widths.append(np.full(len(starts), lw))
+
+    ink = np.zeros(shape, dtype=bool)
+    if not segments:
+        return ink
+    segments = np.concatenate(segments)
+    # Data units -> pixel coordinates (row 0 at the top, as on the page)
+    px = (segments[..., 0] - xlim[0]) * scale
+    py = (ylim[1] - segments[..., 1]) * scale
+    steps = np.ceil(np.hypot(px[:, 1] - px[:, 0], py[:, 1] - py[:, 0]) * 2).astype(int) + 1
+    owner = np.repeat(np.arange(len(segments)), steps)
+    # Position of every sample along its segment, from 0 to 1
+    t = (np.arange(len(owner)) - np.repeat(np.cumsum(steps) - steps, steps)) / np.maximum(steps - 1, 1)[owner]
+    x = np.rint(px[owner, 0] + (px[owner, 1] - px[owner, 0]) * t).astype(int)
+    y = np.rint(py[owner, 0] + (py[owner, 1] - py[owner, 0]) * t).astype(int)
+    inside = (x >= 0) & (x < cols) & (y >= 0) & (y < rows)
+    ink[y[inside], x[inside]] = True
+
+    # Widen by half the (widest) stroke: points -> pixels through the page scale
+    half_width = np.concatenate(widths).max() / 2 / scene.point_scale() * scale
+    for _ in range(max(int(round(half_width)), 1)):
+        ink = dilate(ink)
+    return ink
+
+def dilate(mask):
+    grown = mask.copy()
+    grown[1:] |= mask[:-1]
+    grown[:-1] |= mask[1:]
+    grown[:, 1:] |= mask[:, :-1]
+    grown[:, :-1] |= mask[:, 1:]
+    return grown
+
+def erode(mask, diagonal=False):
+    shrunk = mask.copy()
+    shrunk[1:] &= mask[:-1]
+    shrunk[:-1] &= mask[1:]
+    shrunk[:, 1:] &= mask[:, :-1]
+    shrunk[:, :-1] &= mask[:, 1:]
+    shrunk[0], shrunk[-1], shrunk[:, 0], shrunk[:, -1] = False, False, False, False
+    if diagonal:
+        shrunk[1:, 1:] &= mask[:-1, :-1]
+        shrunk[1:, :-1] &= mask[:-1, 1:]
+        shrunk[:-1, 1:] &= mask[1:, :-1]
+        shrunk[:-1, :-1] &= mask[1:, 1:]
+    return shrunk
+
+def label_regions(free):
+    """
+    4-connected components of the free pixels: (rows, cols) array of region ids (-1 on ink), ids 0..n-1.
+    Horizontal runs of free pixels are the nodes, runs touching vertically are the edges; the run graph is
+    a few thousand nodes, merged by min-label propagation with pointer jumping in a handful of array passes.
+    """
+    rows, cols = free.shape
+    padded = np.zeros((rows, cols + 1), dtype=bool)
+    padded[:, :cols] = free
+    starts = padded & ~np.concatenate([np.zeros((rows, 1), dtype=bool), padded[:, :-1]], axis=1)
+    # Run id of every free pixel (run ids count up along the rows)
+    runs = (np.cumsum(starts.ravel()) - 1).reshape(rows, cols + 1)[:, :cols]
+    count = int(starts.sum())
+    if count == 0:
+        return np.full(free.shape, -1)
+
+    touching = free[1:] & free[:-1]
+    a, b = runs[1:][touching], runs[:-1][touching]
+    parent = np.arange(count)
+    while True:
+        low = np.minimum(parent[a], parent[b])
+        updated = parent.copy()
+        np.minimum.at(updated, parent[a], low)
+        np.minimum.at(updated, parent[b], low)
+        # Pointer jumping: every run points straight at the smallest run of its component found so far
+        while True:
+            jumped = updated[updated]
+            if np.array_equal(jumped, updated):
+                break
+            updated = jumped
+        if np.array_equal(updated, parent):
+            break
+        parent = updated
+
+    ids = np.unique(parent, return_inverse=True)[1][runs]
+    ids[~free] = -1
+    return ids
+
+def inner_distance(free):
+    """
+    Distance in pixels from each free pixel to the nearest ink (or raster edge), by repeated erosion with
+    alternating 4- and 8-neighborhoods (an octagonal approximation of the Euclidean distance).
+    """
+    distance = np.zeros(free.shape, dtype=np.int32)
+    current = free
+    step = 0
+    while current.any():
+        step += 1
+        distance[current] = step
+        current = erode(current, diagonal=step % 2 == 0)
+    return distance
+
+def region_edges(ids, max_steps=8):
+    """
+    Pairs (a, b), a < b, of regions that share a border: every region grows into the ink around it until the
+    strokes are covered, and regions that then touch were separated by a single stroke.
+    """
+    grown = ids.copy()
+    for _ in range(max_steps):
+        empty = grown < 0
+        if not empty.any():
+            break
+        fill = np.full_like(grown, -1)
+        np.maximum(fill[1:], grown[:-1], out=fill[1:])
+        np.maximum(fill[:-1], grown[1:], out=fill[:-1])
+        np.maximum(fill[:, 1:], grown[:, :-1], out=fill[:, 1:])
+        np.maximum(fill[:, :-1], grown[:, 1:], out=fill[:, :-1])
+        grown = np.where(empty, fill, grown)
+    pairs = np.concatenate([np.stack([grown[1:].ravel(), grown[:-1].ravel()], axis=1),
+                            np.stack([grown[:, 1:].ravel(), grown[:, :-1].ravel()], axis=1)])
+    pairs = pairs[(pairs[:, 0] >= 0) & (pairs[:, 1] >= 0) & (pairs[:, 0] != pairs[:, 1])]
+    return np.unique(np.sort(pairs, axis=1), axis=0)
+
+def find_regions(scene, resolution=REGION_RESOLUTION):
+    """
+    The closed regions of the scene as (spots, edges). spots: one (x, y, radius) per region, its pole of
+    inaccessibility (the point farthest from its outline) and that distance in data units, largest regions
+    first; edges: (i, j) index pairs of spots whose regions are neighbors.
+    The background around the mandala (regions touching the raster edge) is not included.
+    """
+    xlim, ylim = scene.view_limits()
+    width, height = xlim[1] - xlim[0], ylim[1] - ylim[0]
+    scale = (resolution - 1) / max(width, height)
+    shape = (int(height * scale) + 1, int(width * scale) + 1)
+    # Square pixels: the last column/row may end slightly past the view box
+    xlim = (xlim[0], xlim[0] + (shape[1] - 1) / scale)
+    ylim = (ylim[1] - (shape[0] - 1) / scale, ylim[1])
+
+    free = ~rasterize_outlines(scene, xlim, ylim, shape)
+    ids = label_regions(free)
+    count = ids.max() + 1
+    if count <= 0:
+        return [], []
+    distance = inner_distance(free)
+
+    flat_ids = ids.ravel()
+    areas = np.bincount(flat_ids[flat_ids >= 0], minlength=count)
+    edge = np.unique(np.concatenate([ids[0], ids[-1], ids[:, 0], ids[:, -1]]))
+    keep = areas >= MIN_REGION_PIXELS
+    keep[edge[edge >= 0]] = False
+
+    # Pole of each region: its pixel with the largest distance (last one after sorting by region, then distance)
+    pixels = np.flatnonzero(flat_ids >= 0)
+    order = pixels[np.lexsort((distance.ravel()[pixels], flat_ids[pixels]))]
+    last = np.flatnonzero(np.diff(flat_ids[order], append=count))
+    poles = order[last]
+    region = flat_ids[poles]
+    poles, region = poles[keep[region]], region[keep[region]]
+    by_area = np.argsort(-areas[region], kind="stable")
+    poles, region = poles[by_area], region[by_area]
+
+    # Region id -> spot index (-1 for regions without a spot)
+    spot_index = np.full(count, -1)
+    spot_index[region] = np.arange(len(region))
+    edges = spot_index[region_edges(ids)]
+    edges = edges[(edges >= 0).all(axis=1)]
+
+    rows, cols = np.unravel_index(poles, shape)
+    radius = distance.ravel()[poles] / scale
+    spots = [(float(xlim[0] + c / scale), float(ylim[1] - r / scale), float(d))
+             for r, c, d in zip(rows, cols, radius)]
+    return spots, [(int(a), int(b)) for a, b in edges]
+
+def hint_spots(scene, resolution=REGION_RESOLUTION):
+    """
+    Where hints go: find_regions() with the radius in points.
+    """
+    point_scale = scene.point_scale()
+    spots, edges = find_regions(scene, resolution)
+    return [(x, y, radius * point_scale) for x, y, radius in spots], edges
+
+def hint_size(text, radius):
+    """
+    Font size of the largest (approximate) bold text box that fits in a circle of radius points,
+    or None if that is below HINT_MIN_SIZE.
+    """
+    half_width = 0.31 * max(len(text), 1)
+    size = min(radius / np.hypot(half_width, 0.36), HINT_MAX_SIZE)
+    return size if size >= HINT_MIN_SIZE else None
@@ -0,0 +1,151 @@
+# render_cache.py (content-addressed cache for rendered mandala images and finished PDFs)
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import importlib.util
+
+CACHE_DIR = "cache"
+CACHE_MAX_MB = 2048
+
+# Modules whose source decides what an image / a page looks like: editing one of them changes its version
+RENDERER_MODULES = ["mandala_generator", "geometry", "scene", "regions", "color_assigner", "mpl_renderer",
+                    "svg_tools", "png_tools"]
+TEMPLATE_MODULES = {"latex": ["latex_tools"], "native": ["pdf_tools", "png_tools", "scene"]}
+
+_versions = {}
+
+def source_version(module_names):
+    """
+    Short hash of the source files of the given modules (found without importing them).
+    """
+    key = tuple(module_names)
+    if key not in _versions:
+        digest = hashlib.sha256()
+        for name in module_names:
+            spec = importlib.util.find_spec(name)
+            if spec and spec.origin and os.path.exists(spec.origin):
+                with open(spec.origin, "rb") as f:
+                    digest.update(f.read())
+        _versions[key] = digest.hexdigest()[:16]
+    return _versions[key]
+
+def hash_key(fields):
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode("utf-8")).hexdigest()
+
+def image_key(config, seed):
+    return hash_key({
+        "kind": "image",
+        "mandala_style": config.get("mandala_style", "random"),
+        "mandala_max_radius": config.get("mandala_max_radius", 1.35),
+        "color_mode": config.get("color_mode", "basic"),
+        "color_hint_mode": config.get("color_hint_mode", "none"),
+        "hint_placement": config.get("hint_placement", "shape"),
+        "max_colors": config.get("max_colors"),
+        "adjacent_colors": config.get("adjacent_colors", "random"),
+        "raster_mode": config.get("raster_mode", "rgba"),
+        "raster_dpi": config.get("raster_dpi"),
+        "raster_strip_height": config.get("raster_strip_height"),
+        "image_format": config.get("image_format", "png"),
+        "seed": seed,
+        "renderer_version": source_version(RENDERER_MODULES),
+    })
+
+def pdf_key(config, image_keys):
+    # A page (or a whole book) is fully described by its images plus the page template that placed them
+    backend = config.get("pdf_backend", "latex")
+    return hash_key({
+        "kind": "pdf",
+        "images": list(image_keys),
+        "pdf_backend": backend,
+        "template_version": source_version(TEMPLATE_MODULES.get(backend, [])),
+    })
+
+class RenderCache:
+    """
+    Files stored under their content key, written atomically; the least recently used entries are
+    evicted once the cache grows past max_bytes.
+    """
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_MB * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def path(self, key, suffix):
+        return os.path.join(self.cache_dir, key[:2], key + suffix)
+
+    def fetch(self, key, suffix, dest_path):
+        """
+        Copy a cached entry to dest_path; returns False on a miss.
+        """
+        path = self.path(key, suffix)
+        try:
+            shutil.copyfile(path, dest_path)
+        except OSError:
+            return False
+        # Mark as recently used for the LRU eviction
+        os.utime(path)
+        return True
+
+    def store(self, key, suffix, src_path):
+        with open(src_path, "rb") as f:
+            self.write_bytes(key, suffix, f.read())
+
+    def write_bytes(self, key, suffix, data):
+        path = self.path(key, suffix)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file next to the target, then rename: readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def get_json(self, key, suffix=".json"):
+        path = self.path(key, suffix)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            return None
+        os.utime(path)
+        return value
+
+    def put_json(self, key, value, suffix=".json"):
+        self.write_bytes(key, suffix, json.dumps(value).encode("utf-8"))
+
+    def evict(self):
+        """
+        Delete the least recently used entries until the cache fits in max_bytes; returns the number removed.
+        """
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+def open_cache(config):
+    if not config.get("cache", False):
+        return None
+    return RenderCache(config.get("cache_dir", CACHE_DIR), int(config.get("cache_max_mb", CACHE_MAX_MB) * 1024 * 1024))
@@ -0,0 +1,136 @@
+# scene.py (backend-agnostic description of one mandala: outlines and hint labels, NumPy only)
+import numpy as np
+
+# Figure the mandala is fitted into, in inches (the matplotlib renderer's figure size)
+FIGURE_SIZE = (7.7, 10.2)
+# Autoscaled limits leave this fraction of the data range free on every side (matplotlib's axes margins)
+AUTOSCALE_MARGIN = 0.05
+
+class Scene:
+    """
+    Output of the geometry stage: everything a renderer needs to draw one mandala, in data units.
+    Circles, closed polygons and open polylines carry their stroke width in points; labels are the
+    color hints (bold, centered, with a white halo). Renderers only read a Scene, they never draw it twice.
+    """
+    def __init__(self):
+        self.circle_centers = []
+        self.circle_radii = []
+        self.circle_widths = []
+        self.polygons = []
+        self.polygon_widths = []
+        self.lines = []
+        self.line_widths = []
+        # (x, y, text, fontsize, halo width, rotation in degrees, zorder, clip to the axes box)
+        self.labels = []
+        self.xlim = None
+        self.ylim = None
+
+    def add_circles(self, centers, radii, lw):
+        centers = np.asarray(centers, dtype=float).reshape(-1, 2)
+        self.circle_centers.extend(centers)
+        self.circle_radii.extend(np.broadcast_to(radii, (len(centers),)))
+        self.circle_widths.extend(np.broadcast_to(lw, (len(centers),)))
+
+    def add_polygons(self, verts, lw):
+        # verts: array (n_shapes, n_vertices, 2) of closed outlines, as built by geometry.py
+        self.polygons.extend(verts)
+        self.polygon_widths.extend(np.broadcast_to(lw, (len(verts),)))
+
+    def add_lines(self, lines, lw):
+        # lines: array (n_lines, n_points, 2) of open polylines
+        self.lines.extend(lines)
+        self.line_widths.extend(np.broadcast_to(lw, (len(lines),)))
+
+    def add_label(self, x, y, text, fontsize, halo, rotation=0.0, zorder=10, clip=False):
+        self.labels.append((float(x), float(y), text, float(fontsize), float(halo), float(rotation), zorder, clip))
+
+    def set_limits(self, xlim, ylim):
+        self.xlim = (float(xlim[0]), float(xlim[1]))
+        self.ylim = (float(ylim[0]), float(ylim[1]))
+
+    def outline_bounds(self):
+        """
+        (x0, y0, x1, y1) of all outlines, strokes excluded.
+        """
+        boxes = []
+        if self.circle_centers:
+            centers = np.array(self.circle_centers)
+            radii = np.array(self.circle_radii)[:, None]
+            boxes.append(np.concatenate([(centers - radii).min(axis=0), (centers + radii).max(axis=0)]))
+        for shapes in (self.polygons, self.lines):
+            if shapes:
+                points = np.concatenate([np.asarray(s).reshape(-1, 2) for s in shapes])
+                boxes.append(np.concatenate([points.min(axis=0), points.max(axis=0)]))
+        if not boxes:
+            return 0.0, 0.0, 1.0, 1.0
+        boxes = np.array(boxes)
+        return tuple(float(v) for v in np.concatenate([boxes[:, :2].min(axis=0), boxes[:, 2:].max(axis=0)]))
+
+    def view_limits(self):
+        """
+        The visible data box: the explicit limits if set, otherwise the outline bounds plus the autoscale margin.
+        """
+        x0, y0, x1, y1 = self.outline_bounds()
+        dx, dy = (x1 - x0) * AUTOSCALE_MARGIN, (y1 - y0) * AUTOSCALE_MARGIN
+        xlim = self.xlim or (x0 - dx, x1 + dx)
+        ylim = self.ylim or (y0 - dy, y1 + dy)
+        return xlim, ylim
+
+    def point_scale(self, figsize=FIGURE_SIZE):
+        """
+        Points per data unit once the view box is fitted (equal aspect) into the figure,
+        so stroke widths and font sizes keep their size relative to the mandala in every renderer.
+        """
+        (x0, x1), (y0, y1) = self.view_limits()
+        return min(figsize[0] * 72 / (x1 - x0), figsize[1] * 72 / (y1 - y0))
+
+    def save(self, path):
+        """
+        Compact .npz form: shapes of one kind are packed into one point array plus per-shape vertex counts.
+        """
+        def pack(shapes):
+            if not shapes:
+                return np.zeros((0, 2)), np.zeros(0, dtype=np.int32)
+            return (np.concatenate([np.asarray(s, dtype=float).reshape(-1, 2) for s in shapes]),
+                    np.array([len(s) for s in shapes], dtype=np.int32))
+
+        polygon_points, polygon_counts = pack(self.polygons)
+        line_points, line_counts = pack(self.lines)
+        labels = self.labels
+        with open(path, "wb") as f:
+            np.savez_compressed(
+                f,
+                circle_centers=np.array(self.circle_centers, dtype=float).reshape(-1, 2),
+                circle_radii=np.array(self.circle_radii, dtype=float),
+                circle_widths=np.array(self.circle_widths, dtype=float),
+                polygon_points=polygon_points, polygon_counts=polygon_counts,
+                polygon_widths=np.array(self.polygon_widths, dtype=float),
+                line_points=line_points, line_counts=line_counts,
+                line_widths=np.array(self.line_widths, dtype=float),
+                label_numbers=np.array([label[:2] + label[3:7] for label in labels], dtype=float).reshape(-1, 6),
+                label_texts=np.array([label[2] for label in labels], dtype=str),
+                label_clip=np.array([label[7] for label in labels], dtype=bool),
+                limits=np.array(self.xlim + self.ylim if self.xlim and self.ylim else [], dtype=float),
+            )
+
+    @classmethod
+    def load(cls, path):
+        scene = cls()
+        with np.load(path) as data:
+            scene.circle_centers = list(data["circle_centers"])
+            scene.circle_radii = list(data["circle_radii"])
+            scene.circle_widths = list(data["circle_widths"])
+            for points_key, counts_key, shapes in (("polygon_points", "polygon_counts", scene.polygons),
+                                                   ("line_points", "line_counts", scene.lines)):
+                counts = data[counts_key]
+                if len(counts):
+                    shapes.extend(np.split(data[points_key], np.cumsum(counts)[:-1]))
+            scene.polygon_widths = list(data["polygon_widths"])
+            scene.line_widths = list(data["line_widths"])
+            for (x, y, size, halo, rotation, zorder), text, clip in zip(data["label_numbers"], data["label_texts"],
+                                                                         data["label_clip"]):
+                scene.add_label(x, y, str(text), size, halo, rotation, int(zorder), bool(clip))
+            limits = data["limits"]
+            if len(limits):
+                scene.set_limits(limits[:2], limits[2:])
+        return scene
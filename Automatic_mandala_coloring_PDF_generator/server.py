@@ -0,0 +1,293 @@
+# server.py (local generation daemon: warm worker processes, a priority job queue, PDFs streamed over HTTP)
+import os
+import json
+import uuid
+import queue
+import shutil
+import signal
+import itertools
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from telemetry import log
+
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+# Lower runs first; interactive previews should send 0
+DEFAULT_PRIORITY = 10
+MAX_JOB_PAGES = 100
+# Seconds a request waits for one page before answering with an error
+PAGE_TIMEOUT = 600
+# Job fields that override config.json for one request, with their allowed values:
+# a list of choices, or (type, min, max) for numbers
+JOB_FIELDS = {
+    "mandala_style": ["random", "geometric", "easy_mandala"],
+    "mandala_max_radius": (float, 0.5, 3.0),
+    "color_mode": ["basic", "advanced"],
+    "color_hint_mode": ["none", "name", "number"],
+    "hint_placement": ["shape", "regions"],
+    "max_colors": (int, 1, 100),
+    "adjacent_colors": ["random", "different"],
+    "raster_mode": ["rgba", "gray", "bilevel"],
+    # A warm worker renders a whole page at this dpi in memory (about 110 MB at 600 dpi)
+    "raster_dpi": (int, 36, 600),
+    "raster_strip_height": (int, 16, 2048),
+    "image_format": ["png", "pdf", "svg", "scene"],
+    "pdf_backend": ["latex", "native"],
+}
+# Number fields that may also be null (their config default)
+OPTIONAL_JOB_FIELDS = ["max_colors", "raster_dpi", "raster_strip_height"]
+
+def warm_worker(config):
+    """
+    Runs once in every worker process: load the modules and the figure, and render one throwaway page,
+    so the first real request already finds imports, font caches and the renderer initialized.
+    """
+    render_page(config, 0)
+
+def render_page(config, seed):
+    """
+    Render one page in this worker and return the PDF bytes (None on failure).
+    """
+    from main import TMP_DIR, render_pdf
+
+    # Under the server's own folder (the pool's parent process), next to the other workers'
+    scratch = os.path.join(TMP_DIR, f"server{os.getppid()}", f"worker{os.getpid()}")
+    os.makedirs(scratch, exist_ok=True)
+    pdf_path = os.path.join(scratch, "page.pdf")
+    try:
+        if not render_pdf(config, os.path.join(scratch, "work"), pdf_path, seed):
+            return None
+        with open(pdf_path, "rb") as f:
+            return f.read()
+    finally:
+        if os.path.exists(pdf_path):
+            os.remove(pdf_path)
+
+class JobQueue:
+    """
+    Pages of all jobs wait in one priority queue; the dispatcher keeps at most `workers` of them in the pool,
+    so a high-priority job overtakes the queued pages of a long low-priority batch.
+    """
+    def __init__(self, config, workers):
+        self.config = config
+        self.workers = workers
+        self.pool = self.new_pool()
+        self.pages = queue.PriorityQueue()
+        self.slots = threading.Semaphore(workers)
+        self.counter = itertools.count()
+        self.dispatcher = threading.Thread(target=self.dispatch, daemon=True)
+        self.dispatcher.start()
+
+    def new_pool(self):
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=warm_worker, initargs=(self.config,))
+
+    def warm_up(self):
+        # Start every worker now instead of on the first request
+        for future in [self.pool.submit(os.getpid) for _ in range(self.workers)]:
+            future.result()
+
+    def submit(self, config, seeds, priority=DEFAULT_PRIORITY):
+        futures = []
+        for seed in seeds:
+            future = Future()
+            self.pages.put((priority, next(self.counter), config, seed, future))
+            futures.append(future)
+        return futures
+
+    def dispatch(self):
+        while True:
+            self.slots.acquire()
+            priority, _, config, seed, future = self.pages.get()
+            if future is None:
+                break
+            try:
+                work = self.pool.submit(render_page, config, seed)
+            except BrokenProcessPool as e:
+                # A worker died (out of memory, crash) and broke the pool: the pages it was running have failed
+                # with it, this one was never started, so it goes to a new pool
+                log("ERROR", f"Worker pool failed ({e}), restarting it")
+                self.pool.shutdown(wait=False, cancel_futures=True)
+                self.pool = self.new_pool()
+                try:
+                    work = self.pool.submit(render_page, config, seed)
+                except Exception as e:
+                    future.set_exception(e)
+                    self.slots.release()
+                    continue
+            except Exception as e:
+                future.set_exception(e)
+                self.slots.release()
+                continue
+            work.add_done_callback(lambda done, target=future: self.finish(done, target))
+
+    def finish(self, done, target):
+        self.slots.release()
+        try:
+            target.set_result(done.result())
+        except Exception as e:
+            target.set_exception(e)
+
+    def pending(self):
+        return self.pages.qsize()
+
+    def shutdown(self):
+        self.pages.put((float("-inf"), -1, None, None, None))
+        self.pool.shutdown(cancel_futures=True)
+
+def check_job_field(key, value):
+    # Raises ValueError (400 Bad Request) for a value the workers should never see
+    allowed = JOB_FIELDS[key]
+    if isinstance(allowed, list):
+        if value not in allowed:
+            raise ValueError(f"{key} must be one of: {', '.join(allowed)}")
+        return
+    if value is None and key in OPTIONAL_JOB_FIELDS:
+        return
+    kind, low, high = allowed
+    number = isinstance(value, (int, float)) if kind is float else isinstance(value, int)
+    if isinstance(value, bool) or not number or not low <= value <= high:
+        raise ValueError(f"{key} must be {'a number' if kind is float else 'an integer'} between {low} and {high}")
+
+def job_config(base_config, job):
+    """
+    Validate a job request; returns (config, seeds, priority) or raises ValueError.
+    """
+    from mandala_generator import new_batch_seed, page_seeds
+
+    if not isinstance(job, dict):
+        raise ValueError("the job must be a JSON object")
+    config = dict(base_config)
+    for key in JOB_FIELDS:
+        if key in job:
+            check_job_field(key, job[key])
+            config[key] = job[key]
+    # Pages are sent back, not stored: no SVG copies next to them
+    if config.get("image_format") == "svg":
+        config["image_format"] = "pdf"
+    count = job.get("count", 1)
+    if not isinstance(count, int) or not 1 <= count <= MAX_JOB_PAGES:
+        raise ValueError(f"count must be an integer between 1 and {MAX_JOB_PAGES}")
+    seed = job.get("seed")
+    if seed is None:
+        seed = new_batch_seed()
+    if not isinstance(seed, int) or seed < 0:
+        raise ValueError("seed must be a non-negative integer")
+    priority = job.get("priority", DEFAULT_PRIORITY)
+    if not isinstance(priority, (int, float)):
+        raise ValueError("priority must be a number")
+    return config, page_seeds(seed, count), priority
+
+class JobHandler(BaseHTTPRequestHandler):
+    """
+    POST /jobs with a JSON job: one page comes back as application/pdf, several pages as a multipart/mixed
+    stream with one application/pdf part per page, sent as soon as that page is ready.
+    GET /status reports the queue.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path != "/status":
+            return self.send_json(404, {"error": "not found"})
+        jobs = self.server.jobs
+        self.send_json(200, {"workers": jobs.workers, "queued_pages": jobs.pending()})
+
+    def do_POST(self):
+        if self.path != "/jobs":
+            return self.send_json(404, {"error": "not found"})
+        try:
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            config, seeds, priority = job_config(self.server.jobs.config, json.loads(body or b"{}"))
+        except ValueError as e:
+            return self.send_json(400, {"error": str(e)})
+
+        futures = self.server.jobs.submit(config, seeds, priority)
+        if len(futures) == 1:
+            pdf = self.wait(futures[0])
+            if pdf is None:
+                return self.send_json(500, {"error": "PDF generation failed", "seed": seeds[0]})
+            self.send_response(200)
+            self.send_header("Content-Type", "application/pdf")
+            self.send_header("Content-Length", str(len(pdf)))
+            self.send_header("X-Mandala-Seed", str(seeds[0]))
+            self.end_headers()
+            self.wfile.write(pdf)
+            return
+
+        boundary = uuid.uuid4().hex
+        self.send_response(200)
+        self.send_header("Content-Type", f"multipart/mixed; boundary={boundary}")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i, (future, seed) in enumerate(zip(futures, seeds)):
+            pdf = self.wait(future)
+            if pdf is None:
+                head, data = "Content-Type: text/plain\r\nX-Mandala-Error: 1", b"PDF generation failed"
+            else:
+                head, data = "Content-Type: application/pdf", pdf
+            head += f"\r\nContent-Disposition: attachment; filename=\"page{i+1}.pdf\"\r\nX-Mandala-Seed: {seed}"
+            self.write_chunk(f"--{boundary}\r\n{head}\r\n\r\n".encode("latin-1") + data + b"\r\n")
+        self.write_chunk(f"--{boundary}--\r\n".encode("latin-1"))
+        self.write_chunk(b"")
+
+    def wait(self, future):
+        try:
+            return future.result(timeout=PAGE_TIMEOUT)
+        except TimeoutError:
+            log("ERROR", f"No page after {PAGE_TIMEOUT} s")
+            return None
+        except Exception as e:
+            log("ERROR", f"Worker failed: {e}")
+            return None
+
+    def write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n")
+        self.wfile.flush()
+
+    def send_json(self, status, value):
+        data = json.dumps(value).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        log("INFO", f"{self.address_string()} {format % args}")
+
+def serve(config, workers, port=None):
+    """
+    Run the generation server on localhost until interrupted.
+    """
+    from main import TMP_DIR
+
+    port = int(port or config.get("server_port", SERVER_PORT))
+    os.makedirs(TMP_DIR, exist_ok=True)
+    jobs = JobQueue(config, workers)
+    log("INFO", f"Starting {workers} warm worker process(es)...")
+    jobs.warm_up()
+    httpd = ThreadingHTTPServer((SERVER_HOST, port), JobHandler)
+    httpd.daemon_threads = True
+    httpd.jobs = jobs
+    log("INFO", f"Listening on http://{SERVER_HOST}:{port} (POST /jobs, GET /status). Press Ctrl+C to stop.")
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    # Service managers and job runners stop daemons with SIGTERM: shut down the same way as on Ctrl+C
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        log("INFO", "Stopping server...")
+    finally:
+        httpd.server_close()
+        jobs.shutdown()
+        # Only this server's scratch files: batches or benchmarks may be running from the same folder
+        shutil.rmtree(os.path.join(TMP_DIR, f"server{os.getpid()}"), ignore_errors=True)
+        try:
+            os.rmdir(TMP_DIR)
+        except OSError:
+            pass
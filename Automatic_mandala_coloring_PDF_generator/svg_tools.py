@@ -0,0 +1,58 @@
+# svg_tools.py (streaming SVG writer for mandala scenes, no matplotlib needed)
+from xml.sax.saxutils import escape
+import numpy as np
+
+# Fonts tried in order by the viewer; the first one matches the matplotlib renderer
+LABEL_FONT_FAMILY = "DejaVu Sans, Helvetica, Arial, sans-serif"
+
+def fmt(value):
+    return f"{value:.2f}".rstrip("0").rstrip(".")
+
+def write_scene_svg(scene, f):
+    """
+    Write the scene as SVG to the text file object f, element by element (nothing is built in memory first).
+    Sizes are in points, laid out like the other renderers: same view box, stroke widths and font sizes.
+    """
+    scale = scene.point_scale()
+    (x0, x1), (y0, y1) = scene.view_limits()
+    width, height = (x1 - x0) * scale, (y1 - y0) * scale
+
+    def pt(x, y):
+        # SVG's y axis points down
+        return fmt((x - x0) * scale), fmt((y1 - y) * scale)
+
+    def points(verts):
+        # Whole outline converted at once; "%g" on values rounded to 2 decimals keeps the output short
+        coords = np.round((np.asarray(verts, dtype=float) - (x0, y1)) * (scale, -scale), 2) + 0.0
+        return " ".join("%g,%g" % (x, y) for x, y in coords.tolist())
+
+    f.write('<?xml version="1.0" encoding="utf-8"?>\n'
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{fmt(width)}pt" height="{fmt(height)}pt" '
+            f'viewBox="0 0 {fmt(width)} {fmt(height)}">\n'
+            '<g fill="none" stroke="#000000" stroke-linejoin="miter">\n')
+    for (cx, cy), radius, lw in zip(scene.circle_centers, scene.circle_radii, scene.circle_widths):
+        x, y = pt(cx, cy)
+        f.write(f'<circle cx="{x}" cy="{y}" r="{fmt(radius * scale)}" stroke-width="{fmt(lw)}"/>\n')
+    for verts, lw in zip(scene.polygons, scene.polygon_widths):
+        f.write(f'<polygon points="{points(verts)}" stroke-width="{fmt(lw)}"/>\n')
+    f.write('</g>\n<g fill="none" stroke="#000000" stroke-linecap="square" stroke-linejoin="round">\n')
+    for verts, lw in zip(scene.lines, scene.line_widths):
+        f.write(f'<polyline points="{points(verts)}" stroke-width="{fmt(lw)}"/>\n')
+    f.write('</g>\n')
+
+    # Hint labels: a white stroked copy (the halo) under each black one; a separate element instead of
+    # paint-order, which not every SVG viewer supports
+    f.write(f'<g font-family="{LABEL_FONT_FAMILY}" font-weight="bold" text-anchor="middle" '
+            'dominant-baseline="central" stroke-linejoin="round">\n')
+    for x, y, text, size, halo, rotation, _, _ in sorted(scene.labels, key=lambda label: label[6]):
+        tx, ty = pt(x, y)
+        transform = f' transform="rotate({fmt(-rotation)} {tx} {ty})"' if rotation else ""
+        attrs = f'x="{tx}" y="{ty}" font-size="{fmt(size)}"{transform}'
+        text = escape(text)
+        f.write(f'<text {attrs} fill="none" stroke="#ffffff" stroke-width="{fmt(halo)}">{text}</text>'
+                f'<text {attrs} fill="#000000">{text}</text>\n')
+    f.write('</g>\n</svg>\n')
+
+def save_scene_svg(scene, svg_path):
+    with open(svg_path, "w", encoding="utf-8") as f:
+        write_scene_svg(scene, f)
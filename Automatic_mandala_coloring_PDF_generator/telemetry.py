@@ -0,0 +1,88 @@
+# telemetry.py (structured events: hook interface, JSON-lines log, optional cProfile per page)
+import os
+import json
+import time
+from contextlib import contextmanager
+
+_hooks = []
+_log_paths = set()
+
+def add_hook(hook):
+    """
+    hook(event) is called with a dict for every event: {"event": name, "time": ..., "pid": ..., <fields>}.
+    """
+    _hooks.append(hook)
+
+def remove_hook(hook):
+    if hook in _hooks:
+        _hooks.remove(hook)
+
+def emit(event, **fields):
+    if not _hooks:
+        return
+    record = {"event": event, "time": round(time.time(), 3), "pid": os.getpid()}
+    record.update(fields)
+    for hook in list(_hooks):
+        hook(record)
+
+@contextmanager
+def timed(event, **fields):
+    """
+    Emit event with its duration ("ms") when the block ends; the block may add fields to the yielded dict.
+    """
+    start = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        emit(event, ms=round((time.perf_counter() - start) * 1000, 2), **fields)
+
+def log(level, message):
+    """
+    Console message in the usual "[LEVEL] message" form, also sent to the hooks as a "log" event.
+    """
+    print(f"[{level}] {message}")
+    emit("log", level=level, message=message)
+
+class JsonLinesLog:
+    """
+    Hook appending one JSON object per line. Every process opens the file in append mode and writes whole
+    lines, so the main process and the workers can share one log.
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, record):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, default=str) + "\n")
+
+def configure(config):
+    """
+    Install the JSON-lines log from config["telemetry_log"]; safe to call again (e.g. once per worker task).
+    """
+    path = config.get("telemetry_log")
+    if path and path not in _log_paths:
+        _log_paths.add(path)
+        add_hook(JsonLinesLog(path))
+
+@contextmanager
+def profiled(config, name):
+    """
+    With config["profile_dir"] set, run the block under cProfile and dump the stats to <profile_dir>/<name>.prof
+    (open them with "python -m pstats" or snakeviz).
+    """
+    profile_dir = config.get("profile_dir")
+    if not profile_dir:
+        yield
+        return
+    import cProfile
+
+    os.makedirs(profile_dir, exist_ok=True)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        path = os.path.join(profile_dir, f"{name}.prof")
+        profiler.dump_stats(path)
+        emit("profile", name=name, path=path)